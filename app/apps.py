@@ -5,4 +5,12 @@ from pathlib import Path
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
-    path = Path(__file__).resolve().parent 
\ No newline at end of file
+    path = Path(__file__).resolve().parent
+
+    def ready(self):
+        # Registrar las señales de invalidación de las cachés
+        import src.lib.OrderStatus.infrastructure.Django.OrderStatusCache  # noqa: F401
+        import src.lib.Product.infrastructure.Django.ProductCatalogCache  # noqa: F401 
+        import src.lib.Order.infrastructure.Django.OrderStatusHub  # noqa: F401
+        import src.permission_cache  # noqa: F401
+        import src.authentication  # noqa: F401
@@ -0,0 +1,44 @@
+'''
+Carga o actualiza el catálogo de productos desde un CSV o JSONL.
+
+    python manage.py import_catalog catalogo.csv --user admin
+    python manage.py import_catalog precios.jsonl --user admin --dry-run
+
+Columnas: id, name, description, price, image, available. Las filas con id
+actualizan ese producto; sin id se busca por nombre y, si no existe, se crea.
+Solo se escriben las columnas presentes en el archivo.
+'''
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from src.lib.Product.infrastructure.Django.ProductCatalogImport import ProductCatalogImport
+
+
+class Command(BaseCommand):
+    help = 'Carga o actualiza el catálogo de productos desde un CSV o JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='archivo CSV (con encabezado) o JSONL')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='por defecto según la extensión')
+        parser.add_argument('--user', required=True, help='usuario que queda como autor de los cambios')
+        parser.add_argument('--dry-run', action='store_true', help='validar y contar sin aplicar')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('El usuario {} no existe.'.format(options['user']))
+
+        file_format = options['format'] or ('jsonl' if options['file'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        with open(options['file'], encoding='utf-8-sig') as catalog_file:
+            content = catalog_file.read()
+
+        try:
+            summary = ProductCatalogImport(user).run(content, file_format, dry_run=options['dry_run'])
+        except ValidationError as error:
+            raise CommandError('\n'.join(error.messages))
+
+        self.stdout.write('{}creados: {created}, actualizados: {updated}, sin cambios: {unchanged}'.format(
+            '(dry-run) ' if summary['dry_run'] else '', **summary
+        ))
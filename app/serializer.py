@@ -3,6 +3,7 @@
 from rest_framework import serializers
 from infrastructure.models import Product, Order, OrderStatus, OrderDetail
 from django.contrib.auth.models import User
+from src.lib.OrderStatus.infrastructure.Django.OrderStatusCache import order_status_cache
 
 
 # Serializador para Product
@@ -12,11 +13,78 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class CachedOrderStatusField(serializers.PrimaryKeyRelatedField):
+    '''
+    Resuelve el estado desde la tabla en memoria de estados en lugar de
+    consultar la base de datos.
+    '''
+
+    def to_internal_value(self, data):
+        try:
+            return order_status_cache.get(data)
+        except OrderStatus.DoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+
+
 class OrderSerializer(serializers.ModelSerializer):
+    status = CachedOrderStatusField(queryset=OrderStatus.objects.all(), required=False, allow_null=True)
+
     class Meta:
         model = Order
         fields = '__all__'
 
+# Campos usados solo para formatear valores igual que ModelSerializer.
+datetime_field = serializers.DateTimeField()
+decimal_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class OrderListSerializer(serializers.ModelSerializer):
+    '''
+    Serializador de solo lectura para el listado de órdenes.
+    Arma la representación directamente desde las relaciones ya cargadas
+    (select_related de customer/status y prefetch de details con su producto),
+    sin pasar campo por campo por los serializadores de DRF.
+    '''
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+    def format_datetime(self, value):
+        return datetime_field.to_representation(value) if value else None
+
+    def format_decimal(self, value):
+        return decimal_field.to_representation(value) if value is not None else None
+
+    def to_representation(self, order):
+        customer = order.customer
+        status = order.status
+        return {
+            'id': order.id,
+            'created_at': self.format_datetime(order.created_at),
+            'updated_at': self.format_datetime(order.updated_at),
+            'is_active': order.is_active,
+            'deleted_at': self.format_datetime(order.deleted_at),
+            'delivery_location': order.delivery_location,
+            'total': self.format_decimal(order.total),
+            'created_by': order.created_by_id,
+            'updated_by': order.updated_by_id,
+            'customer': order.customer_id,
+            'customer_name': customer.get_full_name() if customer else None,
+            'status': order.status_id,
+            'status_name': status.name if status else None,
+            'details': [
+                {
+                    'id': detail.id,
+                    'product': detail.product_id,
+                    'product_name': detail.product.name if detail.product else None,
+                    'quantity': detail.quantity,
+                    'unit_price': self.format_decimal(detail.unit_price),
+                    'subtotal': self.format_decimal(detail.subtotal),
+                }
+                for detail in order.details.all()
+            ],
+        }
+
 class OrderStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderStatus
@@ -1,9 +1,18 @@
-from rest_framework import generics
-from src.view import BaseViewSet
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+from rest_framework import generics, status
+from rest_framework.decorators import action
+from src.idempotency import idempotency_store
+from src.view import BaseViewSet, validate_permission
 from infrastructure.models import Order, Product, OrderStatus, OrderDetail
-from .serializer import OrderSerializer, ProductSerializer, OrderStatusSerializer, OrderDetailSerializer   
+from .serializer import OrderSerializer, OrderListSerializer, ProductSerializer, OrderStatusSerializer, OrderDetailSerializer   
 from rest_framework.permissions import IsAuthenticated
 from src.lib.Order.infrastructure.Django.OrderCreateRequest import OrderCreateRequest
+from src.lib.Order.infrastructure.Django.OrderStatusStreamRequest import EventStreamRenderer, OrderStatusStreamRequest
+from src.lib.Product.infrastructure.Django.ProductCatalogCache import product_catalog_cache
+from src.lib.Product.infrastructure.Django.ProductCatalogImport import ProductCatalogImport
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
 # View for Product
 class ProductView(BaseViewSet):
@@ -11,15 +20,110 @@ class ProductView(BaseViewSet):
     serializer_class = ProductSerializer
     # permission_classes = [IsAuthenticated]
 
+    def list(self, request):
+        """
+        El catálogo se sirve desde product_catalog_cache, con ETag por versión.
+        Las exportaciones y ?nopaginate siguen el flujo normal.
+        """
+        if request.GET.get('export') or request.GET.get('nopaginate'):
+            return super().list(request)
+
+        permission = validate_permission('view', self.app_code, self.permission_code, request)
+        if not permission is True:
+            return permission
+
+        return product_catalog_cache.list_response(request, lambda: super(BaseViewSet, self).list(request))
+
+    def retrieve(self, request, pk=None):
+        permission = validate_permission('retrieve', self.app_code, self.permission_code, request)
+        if not permission is True:
+            return permission
+
+        return product_catalog_cache.detail_response(request, pk, lambda: super(BaseViewSet, self).retrieve(request, pk=pk))
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def catalog_import(self, request):
+        """
+        Carga o actualiza el catálogo completo desde un CSV o JSONL, enviado
+        como archivo multipart ('file') o como cuerpo text/csv o
+        application/x-ndjson. ?format_type=csv|jsonl fuerza el formato y
+        ?dry_run=1 valida y cuenta los cambios sin aplicarlos.
+        """
+        for type in ('add', 'change'):
+            permission = validate_permission(type, self.app_code, self.permission_code, request)
+            if not permission is True:
+                return permission
+
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'detail': 'Falta el archivo (file).'}, status=status.HTTP_400_BAD_REQUEST)
+            name, content = upload.name, upload.read()
+        else:
+            name, content = '', request.body
+
+        file_format = request.GET.get('format_type')
+        if not file_format:
+            file_format = 'jsonl' if 'ndjson' in request.content_type or name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+        try:
+            summary = ProductCatalogImport(request.user).run(
+                content.decode('utf-8-sig'), file_format, dry_run=request.GET.get('dry_run') in ('1', 'true')
+            )
+        except UnicodeDecodeError:
+            return Response({'detail': 'El archivo debe estar en UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as error:
+            return Response({'detail': error.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+
 # View for Order
 class OrderView(BaseViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     # permission_classes = [IsAuthenticated]
+    # El listado muestra el cliente, los detalles, sus productos y el estado
+    conditional_related = ('customer', 'details', 'details__product', 'status')
+    # El usuario no tiene updated_at: el listado muestra su nombre completo
+    conditional_related_fields = {'customer': ('first_name', 'last_name')}
+
+    def get_queryset(self):
+        """
+        En el listado se traen customer y status con JOIN y los detalles con
+        su producto en un solo prefetch, para que una página cueste un número
+        constante de queries sin importar su tamaño.
+        """
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.select_related('customer', 'status').prefetch_related(
+                Prefetch('details', queryset=OrderDetail.objects.select_related('product'))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderListSerializer
+        return super().get_serializer_class()
     
     def create(self, request):
+        """
+        Con el header Idempotency-Key los reintentos de un cliente retornan
+        la orden ya creada en lugar de crear otra.
+        """
         create_request = OrderCreateRequest()
-        return create_request.create(request)
+        return idempotency_store.respond(request, lambda: create_request.create(request))
+
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def stream(self, request):
+        """
+        Cambios de estado de las órdenes en tiempo real (text/event-stream),
+        en lugar de consultar el listado periódicamente.
+        """
+        permission = validate_permission('view', self.app_code, self.permission_code, request)
+        if not permission is True:
+            return permission
+
+        stream_request = OrderStatusStreamRequest()
+        return stream_request.stream(request)
     
 class OrderStatusView(BaseViewSet):
     queryset = OrderStatus.objects.all()
@@ -0,0 +1,114 @@
+'''
+Stress test del manejo de conexiones a PostgreSQL. Simula peticiones
+(request_started -> query -> request_finished, igual que el handler de Django)
+desde varios hilos y compara la latencia en tres modos:
+
+    per-request  CONN_MAX_AGE = 0, una conexión nueva por petición
+    persistent   CONN_MAX_AGE = 60 con CONN_HEALTH_CHECKS
+    pool         backend src.postgresql_pool
+
+Usa la base de datos de config.settings (DB_HOST, DB_NAME, ...), por ejemplo
+contra un Postgres local:
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres postgres:15
+    DB_HOST=localhost DB_PASSWORD=postgres python manage.py migrate
+    DB_HOST=localhost DB_PASSWORD=postgres python bench/db_connections.py
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from serve import percentile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'per-request': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_POOL': 'true'},
+}
+
+
+def run_worker(requests, threads):
+    '''Ejecuta las peticiones simuladas en el proceso actual y retorna las latencias.'''
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.core import signals
+    from django.db import connection
+
+    latencies = []
+    lock = threading.Lock()
+
+    def simulate():
+        local = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            signals.request_started.send(sender=None)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT id, name, price FROM products WHERE deleted_at IS NULL LIMIT 10')
+                cursor.fetchall()
+            signals.request_finished.send(sender=None)
+            local.append(time.perf_counter() - start)
+        # Cerrar la conexión del hilo al terminar.
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=simulate) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='peticiones por hilo')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--mode', choices=MODES, action='append', help='modos a ejecutar (todos por defecto)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--json', help='archivo donde guardar el reporte')
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.requests, args.threads)))
+        return
+
+    report = {}
+    for mode in args.mode or MODES:
+        # Cada modo corre en su propio proceso porque DATABASES se lee al iniciar Django.
+        env = dict(os.environ, **MODES[mode])
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', '--requests', str(args.requests), '--threads', str(args.threads)],
+            env=env, cwd=BASE_DIR, check=True, capture_output=True, text=True,
+        ).stdout
+        report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print('{:<12} {:>9} {:>9} {:>9} {:>9}'.format('mode', 'rps', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for mode, row in report.items():
+        print('{:<12} {:>9} {:>9} {:>9} {:>9}'.format(mode, row['rps'], row['p50_ms'], row['p95_ms'], row['p99_ms']))
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
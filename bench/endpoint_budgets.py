@@ -0,0 +1,349 @@
+'''
+Presupuesto de queries y de tiempo por endpoint. Recorre todas las rutas de
+app/urls.py (las del admin solo en sus listados) con un cliente de pruebas
+autenticado con JWT, como un cliente real, y mide para cada caso:
+
+    queries       número de queries en caliente (última repetición)
+    queries_cold  número de queries de la primera repetición (cachés vacías)
+    p50_ms        mediana del tiempo de respuesta
+    p95_ms        percentil 95 del tiempo de respuesta
+
+Los resultados se comparan con bench/endpoint_budgets.json; un caso falla si
+supera su presupuesto de queries, si su p50 supera el de tiempo, o si cambia
+su status. --write-budgets toma como presupuesto de tiempo el p95 medido más
+BUDGET_MARGIN, con un piso de MIN_BUDGET_MS. También
+falla si alguna ruta de app/urls.py no tiene caso. El reporte (--json) es
+estable para poder compararlo entre versiones con diff.
+
+    DB_HOST=localhost DB_PASSWORD=postgres python manage.py migrate
+    DB_HOST=localhost DB_PASSWORD=postgres python bench/endpoint_budgets.py --seed 20000
+    # Después de una optimización, regenerar los presupuestos:
+    DB_HOST=localhost DB_PASSWORD=postgres python bench/endpoint_budgets.py --write-budgets
+
+El archivo de presupuestos se generó sobre una base nueva con --seed 20000.
+Los presupuestos de tiempo dependen de la máquina; los de queries no
+dependen del volumen de datos.
+'''
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+from seed import seed, setup_django
+from serve import percentile
+
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endpoint_budgets.json')
+# Piso del presupuesto de tiempo, para que el ruido no haga fallar los endpoints rápidos
+MIN_BUDGET_MS = 50
+# Margen sobre el p95 medido al generar los presupuestos de tiempo
+BUDGET_MARGIN = 1.25
+
+
+class Case:
+    '''
+    Una petición a una ruta. prepare() se ejecuta fuera de la medición en
+    cada repetición y retorna los kwargs de la ruta y el body, así los casos
+    que modifican datos (PUT, DELETE) trabajan siempre sobre un registro nuevo.
+    headers puede ser una función, que también se evalúa fuera de la medición.
+    Con un content_type distinto de JSON el body se envía tal cual.
+    '''
+
+    def __init__(self, route, method, prepare=None, query='', headers=None, stream=True, admin=False, label='',
+                 content_type='application/json'):
+        self.route = route
+        self.label = label
+        self.method = method
+        self.prepare = prepare or (lambda: ({}, None))
+        self.query = query
+        self.headers = headers or {}
+        self.stream = stream
+        self.admin = admin
+        self.content_type = content_type
+
+    @property
+    def name(self):
+        if self.label:
+            return '{} {} ({})'.format(self.method, self.route, self.label)
+        return '{} {}{}'.format(self.method, self.route, '?' + self.query if self.query else '')
+
+
+def clone(model, pk, **changes):
+    '''Crea una copia del registro pk para que un caso la modifique o la elimine.'''
+    instance = model.objects.get(pk=pk)
+    instance.pk = instance.id = None
+    for field, value in changes.items():
+        setattr(instance, field, value)
+    instance.save()
+    return instance.pk
+
+
+def build_cases(client, fixtures):
+    from django.urls import reverse
+    from infrastructure.models import Order, OrderDetail, OrderStatus, Product
+
+    def detail_body(route, pk):
+        # El mismo cuerpo que retorna el GET, los campos de solo lectura se ignoran
+        return client.get(reverse(route, kwargs={'pk': pk})).json()
+
+    def catalog_body():
+        # Reprecia los productos del fixture, el costo no debe crecer con las filas
+        prices = Product.objects.filter(pk__in=fixtures['products']).values_list('id', 'price')
+        return 'id,price\n' + ''.join('{},{}\n'.format(pk, (price or 0) + 1) for pk, price in prices)
+
+    def order_body():
+        return {'delivery_location': 'Mesa 1', 'details': [
+            {'product': pk, 'quantity': 2} for pk in fixtures['products'][:5]
+        ]}
+
+    resources = {
+        'products': (Product, fixtures['product']),
+        'orders': (Order, fixtures['order']),
+        'order-status': (OrderStatus, fixtures['status']),
+        'order-details': (OrderDetail, fixtures['detail']),
+    }
+
+    cases = [
+        Case('token_obtain_pair', 'POST', lambda: ({}, {'username': fixtures['username'], 'password': fixtures['password']})),
+        Case('token_refresh', 'POST', lambda: ({}, {'refresh': fixtures['refresh']})),
+        Case('api-root', 'GET'),
+    ]
+    for basename, (model, pk) in resources.items():
+        cases += [
+            Case(basename + '-list', 'GET'),
+            Case(basename + '-list', 'GET', query='export=ndjson'),
+            Case(basename + '-info', 'POST'),
+            Case(basename + '-detail', 'GET', lambda pk=pk: ({'pk': pk}, None)),
+            Case(basename + '-detail', 'PUT', lambda basename=basename, pk=pk: ({'pk': pk}, detail_body(basename + '-detail', pk))),
+            Case(basename + '-detail', 'DELETE', lambda model=model, pk=pk: ({'pk': clone(model, pk)}, None)),
+        ]
+        if basename != 'orders':
+            cases.append(Case(basename + '-list', 'POST', lambda basename=basename, pk=pk: ({}, detail_body(basename + '-detail', pk))))
+
+    cases += [
+        Case('orders-list', 'POST', lambda: ({}, order_body())),
+        # Revalidación con el ETag actual del listado: 304
+        Case('orders-list', 'GET', headers=lambda: {'HTTP_IF_NONE_MATCH': client.get(reverse('orders-list'))['ETag']}, label='If-None-Match'),
+        Case('order-details-list', 'GET', query='order_id={}'.format(fixtures['order']), label='order_id'),
+        # El stream no termina: solo se mide hasta que responde los headers. Con el
+        # Accept de EventSource, que la negociación de contenido debe aceptar
+        Case('orders-stream', 'GET', headers={'HTTP_ACCEPT': 'text/event-stream'}, stream=False),
+        Case('products-catalog-import', 'POST', lambda: ({}, catalog_body()), content_type='text/csv'),
+        Case('admin:infrastructure_order_changelist', 'GET', admin=True),
+        Case('admin:infrastructure_orderdetail_changelist', 'GET', admin=True),
+    ]
+    return cases
+
+
+def route_names():
+    '''Nombres de las rutas de app/urls.py, sin las del admin.'''
+    from django.urls import get_resolver
+
+    names = set()
+
+    def walk(resolver):
+        for pattern in resolver.url_patterns:
+            if hasattr(pattern, 'url_patterns'):
+                if pattern.namespace != 'admin':
+                    walk(pattern)
+            elif pattern.name:
+                names.add(pattern.name)
+
+    walk(get_resolver())
+    return names
+
+
+class QueryCounter:
+    '''
+    execute_wrapper que cuenta las queries. CaptureQueriesContext no sirve
+    para los endpoints con N+1: su registro guarda como máximo 9000 queries.
+    Los savepoints no se cuentan, fuera de la transacción del reporte los
+    bloques atómicos de las vistas no los ejecutan.
+    '''
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def close_response(response):
+    '''
+    Cierra una respuesta en streaming sin leerla. Como hace el cliente de
+    pruebas, sin cerrar la conexión a la base de datos en request_finished,
+    que cortaría la transacción del reporte.
+    '''
+    from django.core.signals import request_finished
+    from django.db import close_old_connections
+
+    request_finished.disconnect(close_old_connections)
+    try:
+        response.close()
+    finally:
+        request_finished.connect(close_old_connections)
+
+
+def run_case(case, api_client, admin_client, repeat):
+    from django.db import connection
+    from django.urls import reverse
+
+    client = admin_client if case.admin else api_client
+    durations = []
+    query_counts = []
+    status = None
+    for _ in range(repeat):
+        kwargs, body = case.prepare()
+        headers = case.headers() if callable(case.headers) else case.headers
+        path = reverse(case.route, kwargs=kwargs) + ('?' + case.query if case.query else '')
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            if body is not None and case.content_type == 'application/json':
+                body = json.dumps(body)
+            response = client.generic(case.method, path, body or '', content_type=case.content_type, **headers)
+            if case.stream and getattr(response, 'streaming', False):
+                # El cliente cierra la respuesta al terminar de leerla
+                b''.join(response.streaming_content)
+            durations.append((time.perf_counter() - start) * 1000)
+        if not case.stream:
+            close_response(response)
+        query_counts.append(counter.count)
+        status = response.status_code
+
+    return {
+        'case': case.name,
+        'status': status,
+        'queries': query_counts[-1],
+        'queries_cold': query_counts[0],
+        'p50_ms': round(statistics.median(durations), 2),
+        'p95_ms': round(percentile(durations, 95), 2),
+        'max_ms': round(max(durations), 2),
+    }
+
+
+def load_fixtures(user_password):
+    from django.contrib.auth import get_user_model
+    from infrastructure.models import Order, OrderDetail, OrderStatus, Product
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    user = get_user_model().objects.get(username='bench')
+    order = Order.objects.filter(details__isnull=False).order_by('id').first()
+    refresh = RefreshToken.for_user(user)
+    return user, {
+        'username': user.username,
+        'password': user_password,
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'order': order.id,
+        'detail': OrderDetail.objects.filter(order=order).first().id,
+        'product': Product.objects.order_by('id').first().id,
+        'products': list(Product.objects.order_by('id').values_list('id', flat=True)[:5]),
+        'status': OrderStatus.objects.order_by('id').first().id,
+    }
+
+
+def check(result, budget):
+    failures = []
+    if budget is None:
+        return ['sin presupuesto']
+    if result['status'] != budget['status']:
+        failures.append('status {} (esperado {})'.format(result['status'], budget['status']))
+    if result['queries'] > budget['queries']:
+        failures.append('{} queries (presupuesto {})'.format(result['queries'], budget['queries']))
+    if result['p50_ms'] > budget['ms']:
+        failures.append('{} ms (presupuesto {})'.format(result['p50_ms'], budget['ms']))
+    return failures
+
+
+def measure(case, api_client, admin_client, args, budgets):
+    result = run_case(case, api_client, admin_client, args.repeat)
+    if not args.write_budgets:
+        result['budget'] = budgets.get(case.name)
+        result['failures'] = check(result, result['budget'])
+    print('{:<4} {:<58} {:>4} {:>5}q {:>9}ms  {}'.format(
+        'FAIL' if result.get('failures') else 'ok', case.name, result['status'], result['queries'],
+        result['p50_ms'], '; '.join(result.get('failures', ())),
+    ))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=0, help='órdenes a cargar antes de medir (0 = usar los datos actuales)')
+    parser.add_argument('--repeat', type=int, default=5, help='repeticiones por caso')
+    parser.add_argument('--budgets', default=BUDGETS_FILE)
+    parser.add_argument('--write-budgets', action='store_true', help='guardar lo medido como nuevos presupuestos')
+    parser.add_argument('--json', help='archivo donde guardar el reporte')
+    args = parser.parse_args()
+
+    # El cliente de pruebas usa WSGI, donde los streams están desactivados por defecto
+    os.environ.setdefault('ORDER_STREAM_WSGI_MAX', '1')
+    setup_django()
+    # Los logs de cada petición (y los de un error inesperado) no deben mezclarse con el reporte
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from django.test import Client
+    from rest_framework.test import APIClient
+
+    if args.seed:
+        seed(orders=args.seed)
+    if not get_user_model().objects.filter(username='bench').exists():
+        parser.error('la base de datos no tiene datos, usa --seed')
+
+    user, fixtures = load_fixtures('bench')
+    api_client = APIClient(HTTP_AUTHORIZATION='Bearer ' + fixtures['access'])
+    api_client.raise_request_exception = False
+    admin_client = Client(raise_request_exception=False)
+    admin_client.force_login(user)
+
+    cases = build_cases(api_client, fixtures)
+    uncovered = sorted(route_names() - {case.route for case in cases})
+
+    budgets = {}
+    if os.path.exists(args.budgets) and not args.write_budgets:
+        with open(args.budgets) as budgets_file:
+            budgets = json.load(budgets_file)
+
+    # Todo corre en una transacción que se revierte, así los casos que crean
+    # registros no cambian los datos (ni los conteos del admin) de la
+    # siguiente ejecución. Los commits de las vistas pasan a ser savepoints,
+    # el tiempo de las escrituras es un piso.
+    with transaction.atomic():
+        results = [measure(case, api_client, admin_client, args, budgets) for case in cases]
+        transaction.set_rollback(True)
+
+    for route in uncovered:
+        print('FAIL ruta sin caso: {}'.format(route))
+
+    if args.write_budgets:
+        budgets = {
+            result['case']: {
+                'status': result['status'],
+                'queries': result['queries'],
+                'ms': max(MIN_BUDGET_MS, int(math.ceil(result['p95_ms'] * BUDGET_MARGIN))),
+            }
+            for result in results
+        }
+        with open(args.budgets, 'w') as budgets_file:
+            json.dump(budgets, budgets_file, indent=2, sort_keys=True)
+            budgets_file.write('\n')
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump({'cases': results, 'uncovered': uncovered}, report_file, indent=2, sort_keys=True)
+            report_file.write('\n')
+
+    failed = uncovered or any(result.get('failures') for result in results)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
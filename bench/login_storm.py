@@ -0,0 +1,161 @@
+'''
+Mide la latencia de los endpoints de órdenes durante una avalancha de
+logins (la apertura de puertas de un evento).
+
+Cada servidor se mide en dos fases de --duration segundos: primero solo
+con los lectores de órdenes (línea base) y después con los lectores más
+--logins hilos que piden /token/ sin pausa. Se reporta la latencia de las
+órdenes en ambas fases y los status de los logins (429/503 son los
+rechazos del pool de src/password_pool.py).
+
+Contra servidores que ya están corriendo:
+
+    python bench/login_storm.py --target pool=http://localhost:8000
+
+Levantando gunicorn localmente con el pool por defecto y con un pool sin
+límite (el comportamiento anterior, todos los hilos calculando hashes):
+
+    python bench/login_storm.py --start
+
+El token y los logins usan BENCH_USERNAME / BENCH_PASSWORD.
+'''
+import argparse
+import json
+import os
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from serve import BASE_DIR, get_token, percentile, wait_ready
+
+ORDERS_PATH = '/api/orders/'
+
+# Variables de entorno de cada servidor de --start
+SERVERS = {
+    'pool': {},
+    'unbounded': {'LOGIN_POOL_WORKERS': '64', 'LOGIN_POOL_QUEUE_SIZE': '1000'},
+}
+
+
+def request(url, data=None, headers=None):
+    '''Retorna (segundos, status); status None si no hubo respuesta.'''
+    body = json.dumps(data).encode() if data is not None else None
+    http_request = urllib.request.Request(url, data=body, headers=dict(headers or {}, **{'Content-Type': 'application/json'}))
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(http_request, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return time.perf_counter() - start, status
+
+
+def loop(stop, call, results):
+    while not stop.is_set():
+        results.append(call())
+
+
+def run_phase(base_url, token, readers, logins, duration):
+    orders, tokens = [], []
+    credentials = {
+        'username': os.environ.get('BENCH_USERNAME', 'admin'),
+        'password': os.environ.get('BENCH_PASSWORD', 'adminpassword'),
+    }
+    read = lambda: request(base_url + ORDERS_PATH, headers={'Authorization': 'Bearer ' + token})
+    login = lambda: request(base_url + '/token/', credentials)
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=loop, args=(stop, read, orders)) for _ in range(readers)]
+    threads += [threading.Thread(target=loop, args=(stop, login, tokens)) for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies = [latency for latency, status in orders if status == 200]
+    login_statuses = Counter(str(status) for _, status in tokens)
+    return {
+        'orders_rps': round(len(orders) / duration, 1),
+        'orders_p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'orders_p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'orders_p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'orders_errors': len(orders) - len(latencies),
+        'logins': dict(sorted(login_statuses.items())),
+        'logins_ok_rps': round(login_statuses['200'] / duration, 1),
+    }
+
+
+def start_servers(base_port, workers, threads):
+    processes, targets = [], []
+    for offset, (name, environment) in enumerate(SERVERS.items()):
+        port = base_port + offset
+        env = dict(os.environ, SERVER_WORKERS=str(workers), SERVER_THREADS=str(threads), **environment)
+        processes.append(subprocess.Popen(
+            ['gunicorn', '-c', 'config/gunicorn.py', '--bind', '127.0.0.1:{}'.format(port)],
+            cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        targets.append((name, 'http://127.0.0.1:{}'.format(port)))
+    for _, base_url in targets:
+        wait_ready(base_url)
+    return processes, targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', default=[], help='nombre=url base del servidor')
+    parser.add_argument('--start', action='store_true', help='levantar gunicorn con y sin límite del pool')
+    parser.add_argument('--port', type=int, default=8011, help='primer puerto para --start')
+    parser.add_argument('--workers', type=int, default=1, help='procesos de gunicorn para --start')
+    parser.add_argument('--threads', type=int, default=4, help='hilos por proceso para --start')
+    parser.add_argument('--readers', type=int, default=4, help='hilos que consultan las órdenes')
+    parser.add_argument('--logins', type=int, default=32, help='hilos que piden /token/ durante la avalancha')
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos por fase')
+    parser.add_argument('--json', help='archivo donde guardar el reporte')
+    args = parser.parse_args()
+
+    processes = []
+    targets = [tuple(target.split('=', 1)) for target in args.target]
+    if args.start:
+        processes, started = start_servers(args.port, args.workers, args.threads)
+        targets += started
+    if not targets:
+        parser.error('se necesita --target o --start')
+
+    report = {}
+    try:
+        for name, base_url in targets:
+            token = get_token(base_url)
+            report[name] = {
+                'baseline': run_phase(base_url, token, args.readers, 0, args.duration),
+                'storm': run_phase(base_url, token, args.readers, args.logins, args.duration),
+            }
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print('{:<12} {:<9} {:>8} {:>8} {:>8} {:>8} {:>7}  {}'.format(
+        'server', 'phase', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'errors', 'logins (status: total)'
+    ))
+    for name, phases in report.items():
+        for phase, row in phases.items():
+            print('{:<12} {:<9} {:>8} {:>8} {:>8} {:>8} {:>7}  {}'.format(
+                name, phase, row['orders_rps'], row['orders_p50_ms'], row['orders_p95_ms'], row['orders_p99_ms'],
+                row['orders_errors'], ', '.join('{}: {}'.format(status, total) for status, total in row['logins'].items()),
+            ))
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
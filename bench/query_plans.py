@@ -0,0 +1,128 @@
+'''
+Regresión de planes de consulta: ejecuta los endpoints de listado con un
+APIClient, captura sus queries, obtiene el plan de cada una con EXPLAIN y
+verifica que las consultas calientes recorran la tabla con uno de los
+índices aceptados, normalmente los parciales (WHERE deleted_at IS NULL) de
+infrastructure/models/. Las demás consultas del request (COUNT, ETag) se
+reportan pero no se evalúan.
+
+Necesita un volumen de datos realista, con pocas filas el planner prefiere
+recorrer la tabla completa:
+
+    DB_HOST=localhost DB_PASSWORD=postgres python manage.py migrate
+    DB_HOST=localhost DB_PASSWORD=postgres python bench/query_plans.py --seed 20000
+
+Termina con código 1 si algún caso no usa el índice esperado.
+'''
+import argparse
+import json
+import sys
+
+from seed import seed, setup_django
+
+
+# (nombre, ruta o None, tabla, prefijos de los índices aceptados). Para
+# order_id también sirve el índice de la llave foránea que crea Django; con
+# pocos estados, recorrer por created_at y filtrar el estado es igual de bueno.
+CASES = [
+    ('orders list ordered by created_at', '/api/orders/?ordering=-created_at', 'orders', ('orders_created_live_idx',)),
+    ('orders list details prefetch', '/api/orders/?ordering=-created_at', 'order_details', ('order_details_order_',)),
+    ('order details of an order', '/api/order-details/?order_id={order}', 'order_details', ('order_details_order_',)),
+    ('products list ordered by created_at', '/api/products/?ordering=-created_at', 'products', ('products_created_live_idx',)),
+    ('orders of a customer', None, 'orders', ('orders_customer_live_idx',)),
+    ('orders in a status', None, 'orders', ('orders_status_live_idx', 'orders_created_live_idx')),
+]
+
+
+def orm_queries(name, order):
+    '''Consultas que no tienen endpoint propio (stream, admin), construidas como en el código.'''
+    from infrastructure.models import Order
+
+    if name == 'orders of a customer':
+        return [Order.objects.filter(customer_id=order.customer_id).order_by('-created_at')[:10]]
+    return [Order.objects.filter(status_id=order.status_id).order_by('-created_at')[:10]]
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(sql, params):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        return cursor.fetchone()[0][0]['Plan']
+
+
+def captured_queries(path, user):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+    from src.lib.Product.infrastructure.Django.ProductCatalogCache import product_catalog_cache
+
+    client = APIClient()
+    client.force_authenticate(user)
+    # Forzar que el catálogo se construya desde la base de datos
+    product_catalog_cache.bump()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError('{} respondió {}'.format(path, response.status_code))
+    return [query['sql'] for query in context.captured_queries]
+
+
+def check_case(name, path, table, indexes, user, order):
+    if path is not None:
+        statements = [(sql, None) for sql in captured_queries(path.format(order=order.id), user)]
+    else:
+        statements = [query.query.sql_with_params() for query in orm_queries(name, order)]
+
+    scans = []
+    for sql, params in statements:
+        if not sql.lstrip().upper().startswith('SELECT') or '"{}"'.format(table) not in sql:
+            continue
+        plan = explain(sql, params)
+        scans.extend(
+            {'node': node['Node Type'], 'index': node.get('Index Name')}
+            for node in plan_nodes(plan) if node.get('Relation Name') == table
+        )
+    return {
+        'case': name,
+        'table': table,
+        'accepted_indexes': indexes,
+        'scans': scans,
+        'ok': any(scan['index'] and scan['index'].startswith(indexes) for scan in scans),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=0, help='órdenes a cargar antes de revisar (0 = usar los datos actuales)')
+    parser.add_argument('--json', help='archivo donde guardar el reporte')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from infrastructure.models import Order
+
+    user = seed(orders=args.seed) if args.seed else get_user_model().objects.filter(is_superuser=True).first()
+    order = Order.objects.order_by('-id').first()
+    if user is None or order is None:
+        parser.error('la base de datos no tiene datos, usa --seed')
+
+    report = [check_case(name, path, table, indexes, user, order) for name, path, table, indexes in CASES]
+    for row in report:
+        used = ', '.join(sorted({scan['index'] or scan['node'] for scan in row['scans']})) or '-'
+        print('{:<4} {:<38} {}'.format('ok' if row['ok'] else 'FAIL', row['case'], used))
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    sys.exit(0 if all(row['ok'] for row in report) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+'''
+Reproduce tráfico capturado contra una instancia local de la API y reporta
+throughput, percentiles de latencia y tasa de errores por ruta, para
+dimensionar la flota de EC2 detrás del NLB con datos.
+
+Lee archivos JSONL en cualquiera de estos formatos (se pueden mezclar):
+
+    # Las líneas de log_api_request de logs/buuelo_y_tinto_*.log
+    2025-03-28 10:00:00 - buuelo_y_tinto - INFO - [abc] - ✅ API Request: {"method": "GET", "path": "/api/orders/", "query": "page=2", ...}
+    # Una petición por línea
+    {"method": "POST", "path": "/api/orders/?page=2", "body": {...}, "headers": {...}}
+
+El log solo guarda el body de una muestra de las peticiones
+(LOG_BODY_SAMPLE_RATE) y lo trunca en LOG_BODY_MAX_BYTES. Las escrituras
+(POST/PUT/PATCH) cuyo body no quedó completo se omiten y se informan:
+enviarlas vacías crearía datos basura y 400 que no son tráfico real. Las
+peticiones al stream de órdenes también se omiten.
+
+    python bench/replay.py logs/buuelo_y_tinto_20250328.log --target http://localhost:8000 --concurrency 64
+
+El cliente es asyncio puro (HTTP/1.1 con keep-alive, una conexión por
+worker), así la concurrencia no está limitada por hilos. El token se obtiene
+de /token/ con BENCH_USERNAME / BENCH_PASSWORD, o se pasa con --token.
+'''
+import argparse
+import asyncio
+import json
+import os
+import re
+import ssl
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from serve import percentile
+
+LOG_MARKER = 'API Request: '
+# Los ids en la ruta se agrupan: /api/orders/15/ -> /api/orders/{id}/
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+SKIPPED_PATHS = re.compile(r'/stream/?$')
+WRITE_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+def parse_line(line):
+    '''Retorna la petición de una línea (log o JSONL) o None si no es una petición.'''
+    line = line.strip()
+    if not line:
+        return None
+    if LOG_MARKER in line:
+        line = line.split(LOG_MARKER, 1)[1]
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or 'path' not in entry:
+        return None
+
+    body = entry.get('body', entry.get('request_body'))
+    # None: el log no muestreó el body de esta petición
+    captured = body is not None
+    if isinstance(body, str):
+        # Los bodies truncados del log terminan con "... (N bytes)" y no son JSON válido
+        try:
+            body = json.loads(body) if body else None
+        except ValueError:
+            body, captured = None, False
+
+    path = entry['path']
+    if entry.get('query'):
+        path += '?' + entry['query']
+    return {
+        'method': entry.get('method', 'GET').upper(),
+        'path': path,
+        'body': body,
+        'body_captured': captured,
+        'headers': entry.get('headers') or {},
+    }
+
+
+def load_requests(paths):
+    '''Retorna (peticiones a reproducir, escrituras omitidas por no tener el body completo).'''
+    requests = []
+    missing_body = 0
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as log_file:
+            for line in log_file:
+                request = parse_line(line)
+                if not request or SKIPPED_PATHS.search(urlsplit(request['path']).path):
+                    continue
+                if request['method'] in WRITE_METHODS and not request['body_captured']:
+                    missing_body += 1
+                    continue
+                requests.append(request)
+    return requests, missing_body
+
+
+def route_of(request):
+    return '{} {}'.format(request['method'], ID_SEGMENT.sub('/{id}', urlsplit(request['path']).path))
+
+
+class HttpConnection:
+    '''Conexión HTTP/1.1 persistente mínima sobre asyncio.open_connection.'''
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.host_header = parts.netloc
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        try:
+            return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+        except BaseException:
+            # La conexión queda en un estado desconocido
+            await self.close()
+            raise
+
+    async def _request(self, method, path, body, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = ['{} {} HTTP/1.1'.format(method, path), 'Host: ' + self.host_header, 'Content-Length: {}'.format(len(payload))]
+        if payload:
+            lines.append('Content-Type: application/json')
+        lines += ['{}: {}'.format(name, value) for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('el servidor cerró la conexión')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            content = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = await self.reader.read()
+            await self.close()
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, content
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Trailers hasta la línea vacía
+                while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+
+async def get_token(base_url, timeout):
+    connection = HttpConnection(base_url, timeout)
+    try:
+        status, content = await connection.request('POST', '/token/', {
+            'username': os.environ.get('BENCH_USERNAME', 'admin'),
+            'password': os.environ.get('BENCH_PASSWORD', 'adminpassword'),
+        })
+    finally:
+        await connection.close()
+    if status != 200:
+        raise RuntimeError('/token/ respondió {}'.format(status))
+    return json.loads(content)['access']
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.failures = defaultdict(int)
+
+    def record(self, route, latency, status=None):
+        if status is None:
+            self.failures[route] += 1
+        else:
+            self.latencies[route].append(latency)
+            self.statuses[route][status] += 1
+
+
+async def worker(queue, base_url, token, timeout, stats):
+    connection = HttpConnection(base_url, timeout)
+    try:
+        while True:
+            request = await queue.get()
+            if request is None:
+                return
+            headers = dict(request['headers'])
+            if token:
+                headers.setdefault('Authorization', 'Bearer ' + token)
+            start = time.perf_counter()
+            try:
+                status, _ = await connection.request(request['method'], request['path'], request['body'], headers)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                stats.record(route_of(request), time.perf_counter() - start)
+            else:
+                stats.record(route_of(request), time.perf_counter() - start, status)
+    finally:
+        await connection.close()
+
+
+async def replay(requests, base_url, token, concurrency, total, timeout):
+    stats = Stats()
+    queue = asyncio.Queue(concurrency * 2)
+    workers = [asyncio.create_task(worker(queue, base_url, token, timeout, stats)) for _ in range(concurrency)]
+
+    start = time.perf_counter()
+    for index in range(total):
+        await queue.put(requests[index % len(requests)])
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    return stats, time.perf_counter() - start
+
+
+def summarize(latencies, statuses, failures, elapsed):
+    count = len(latencies) + failures
+    server_errors = sum(total for status, total in statuses.items() if status >= 500)
+    client_errors = sum(total for status, total in statuses.items() if 400 <= status < 500)
+    return {
+        'requests': count,
+        'rps': round(count / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(max(latencies, default=0) * 1000, 1),
+        # Errores: 5xx más las peticiones sin respuesta (conexión, timeout)
+        'error_rate': round((server_errors + failures) / count, 4) if count else 0.0,
+        'client_error_rate': round(client_errors / count, 4) if count else 0.0,
+        'statuses': {str(status): total for status, total in sorted(statuses.items())},
+        'failures': failures,
+    }
+
+
+def build_report(stats, elapsed):
+    routes = sorted(set(stats.latencies) | set(stats.failures))
+    all_statuses = defaultdict(int)
+    for route in routes:
+        for status, total in stats.statuses[route].items():
+            all_statuses[status] += total
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'total': summarize(
+            [latency for route in routes for latency in stats.latencies[route]], all_statuses,
+            sum(stats.failures.values()), elapsed,
+        ),
+        'routes': {
+            route: summarize(stats.latencies[route], stats.statuses[route], stats.failures[route], elapsed)
+            for route in routes
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='archivos JSONL o logs de log_api_request')
+    parser.add_argument('--target', default='http://localhost:8000', help='url base de la API')
+    parser.add_argument('--concurrency', type=int, default=32, help='peticiones en vuelo')
+    parser.add_argument('--requests', type=int, help='total de peticiones (por defecto una pasada por el archivo)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='segundos por petición')
+    parser.add_argument('--token', help='JWT a usar en lugar de pedirlo a /token/')
+    parser.add_argument('--anonymous', action='store_true', help='no enviar Authorization')
+    parser.add_argument('--json', help='archivo donde guardar el reporte')
+    args = parser.parse_args()
+
+    requests, missing_body = load_requests(args.files)
+    if missing_body:
+        print('{} escrituras omitidas: el log no guardó su body completo'.format(missing_body))
+    if not requests:
+        parser.error('los archivos no tienen peticiones')
+    base_url = args.target.rstrip('/')
+
+    async def run():
+        token = None if args.anonymous else args.token or await get_token(base_url, args.timeout)
+        return await replay(requests, base_url, token, args.concurrency, args.requests or len(requests), args.timeout)
+
+    stats, elapsed = asyncio.run(run())
+    report = build_report(stats, elapsed)
+
+    print('{:<40} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8}'.format('route', 'requests', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+    for route, row in list(report['routes'].items()) + [('TOTAL', report['total'])]:
+        print('{:<40} {:>8} {:>8} {:>8} {:>8} {:>8} {:>7.2%}'.format(
+            route, row['requests'], row['rps'], row['p50_ms'], row['p95_ms'], row['p99_ms'], row['error_rate']
+        ))
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
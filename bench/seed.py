@@ -0,0 +1,114 @@
+'''
+Carga datos de prueba en la base de datos de config.settings para los
+scripts de bench/: usuarios, estados, productos y órdenes con sus detalles,
+con una fracción de filas eliminadas (deleted_at) como en producción.
+
+    DB_HOST=localhost DB_PASSWORD=postgres python bench/seed.py --orders 20000
+
+Los registros se insertan con bulk_create (sin logs de cambios) y al final
+se ejecuta VACUUM ANALYZE para que el planner tenga estadísticas al día.
+'''
+import argparse
+import os
+import random
+import sys
+from decimal import Decimal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+def seed(orders=20000, products=2000, customers=200, details_per_order=5, deleted_ratio=0.3, seed_value=1):
+    '''Inserta los datos y retorna el superusuario con el que se crearon.'''
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from infrastructure.models import Order, OrderDetail, OrderStatus, Product
+
+    User = get_user_model()
+    rng = random.Random(seed_value)
+    now = timezone.now()
+
+    def deleted_at():
+        return now if rng.random() < deleted_ratio else None
+
+    with transaction.atomic():
+        admin = User.objects.filter(username='bench').first()
+        if admin is None:
+            admin = User.objects.create_superuser('bench', 'bench@example.com', 'bench')
+        audit = {'created_by': admin, 'updated_by': admin}
+
+        prefix = 'bench-customer-{}-'.format(User.objects.order_by('-id').values_list('id', flat=True).first())
+        User.objects.bulk_create([
+            User(username=prefix + str(index), email='{}{}@example.com'.format(prefix, index))
+            for index in range(customers)
+        ])
+        customer_ids = list(User.objects.filter(username__startswith=prefix).values_list('id', flat=True))
+
+        statuses = list(OrderStatus.objects.all())
+        if not statuses:
+            statuses = [OrderStatus.objects.create(name=name, description=name, **audit) for name in ('pending', 'preparing', 'ready', 'delivered')]
+
+        new_products = Product.objects.bulk_create([
+            Product(
+                name='Producto {}'.format(index), description='Producto de prueba', price=Decimal(rng.randint(1000, 30000)),
+                deleted_at=deleted_at(), **audit
+            )
+            for index in range(products)
+        ])
+        live_products = [product for product in new_products if product.deleted_at is None]
+
+        for start in range(0, orders, 2000):
+            batch = Order.objects.bulk_create([
+                Order(
+                    customer_id=rng.choice(customer_ids), status=rng.choice(statuses), delivery_location='Mesa {}'.format(index % 40),
+                    total=Decimal('0.00'), deleted_at=deleted_at(), **audit
+                )
+                for index in range(start, min(start + 2000, orders))
+            ])
+            details = []
+            for order in batch:
+                for product in rng.sample(live_products, details_per_order):
+                    quantity = rng.randint(1, 4)
+                    details.append(OrderDetail(
+                        order=order, product=product, quantity=quantity, unit_price=product.price,
+                        subtotal=product.price * quantity, deleted_at=order.deleted_at, **audit
+                    ))
+            OrderDetail.objects.bulk_create(details)
+
+    # auto_now_add pisa created_at en bulk_create: repartir las fechas en el
+    # tiempo, un minuto entre filas, la de mayor id es la más reciente
+    with connection.cursor() as cursor:
+        for table in ('orders', 'products'):
+            cursor.execute(
+                "UPDATE {0} SET created_at = now() - ((SELECT max(id) FROM {0}) - id) * interval '1 minute' "
+                "WHERE created_by_id = %s".format(table),
+                [admin.id],
+            )
+        for table in ('orders', 'order_details', 'products'):
+            cursor.execute('VACUUM ANALYZE {}'.format(table))
+    return admin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--details-per-order', type=int, default=5)
+    parser.add_argument('--deleted-ratio', type=float, default=0.3, help='fracción de filas con deleted_at')
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.orders, args.products, args.customers, args.details_per_order, args.deleted_ratio)
+    print('ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+'''
+Compara el throughput y la latencia de los endpoints de la API entre
+servidores (por ejemplo runserver contra gunicorn).
+
+Contra servidores que ya están corriendo:
+
+    python bench/serve.py --target runserver=http://localhost:8001 --target gunicorn=http://localhost:8002
+
+Levantando ambos servidores localmente (usa la base de datos de config.settings):
+
+    python bench/serve.py --start
+
+El token se obtiene de /token/ con BENCH_USERNAME / BENCH_PASSWORD
+(por defecto el superusuario que crea run.py).
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = (
+    '/api/products/',
+    '/api/orders/',
+    '/api/order-status/',
+    '/api/order-details/',
+)
+
+SERVERS = {
+    'runserver': [sys.executable, 'manage.py', 'runserver', '--noreload', '127.0.0.1:{port}'],
+    'gunicorn': ['gunicorn', '-c', 'config/gunicorn.py', '--bind', '127.0.0.1:{port}'],
+}
+
+
+def get_token(base_url):
+    data = json.dumps({
+        'username': os.environ.get('BENCH_USERNAME', 'admin'),
+        'password': os.environ.get('BENCH_PASSWORD', 'adminpassword'),
+    }).encode()
+    request = urllib.request.Request(base_url + '/token/', data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())['access']
+
+
+def fetch(url, token):
+    request = urllib.request.Request(url, headers={'Authorization': 'Bearer ' + token})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            ok = response.status < 400
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_endpoint(base_url, path, token, requests, concurrency):
+    url = base_url + path
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: fetch(url, token), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        'path': path,
+        'requests': requests,
+        'errors': errors,
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+def wait_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/api/', timeout=2)
+            return
+        except urllib.error.HTTPError:
+            # 401 también indica que el servidor está arriba.
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError('El servidor {} no respondió'.format(base_url))
+
+
+def start_servers(base_port):
+    processes, targets = [], []
+    for offset, (name, command) in enumerate(SERVERS.items()):
+        port = base_port + offset
+        command = [part.format(port=port) for part in command]
+        processes.append(subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        targets.append((name, 'http://127.0.0.1:{}'.format(port)))
+    for _, base_url in targets:
+        wait_ready(base_url)
+    return processes, targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', default=[], help='nombre=url base del servidor')
+    parser.add_argument('--start', action='store_true', help='levantar runserver y gunicorn localmente')
+    parser.add_argument('--port', type=int, default=8001, help='primer puerto para --start')
+    parser.add_argument('--requests', type=int, default=500, help='peticiones por endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--json', help='archivo donde guardar el reporte')
+    args = parser.parse_args()
+
+    processes = []
+    targets = [tuple(target.split('=', 1)) for target in args.target]
+    if args.start:
+        processes, started = start_servers(args.port)
+        targets += started
+    if not targets:
+        parser.error('se necesita --target o --start')
+
+    report = {}
+    try:
+        for name, base_url in targets:
+            token = get_token(base_url)
+            report[name] = [
+                run_endpoint(base_url, path, token, args.requests, args.concurrency)
+                for path in ENDPOINTS
+            ]
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print('{:<12} {:<22} {:>8} {:>8} {:>8} {:>8} {:>7}'.format('server', 'endpoint', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+    for name, rows in report.items():
+        for row in rows:
+            print('{:<12} {:<22} {:>8} {:>8} {:>8} {:>8} {:>7}'.format(
+                name, row['path'], row['rps'], row['p50_ms'], row['p95_ms'], row['p99_ms'], row['errors']
+            ))
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Configuración de gunicorn para producción.
+
+    gunicorn -c config/gunicorn.py
+
+Variables de entorno:
+    SERVER_INTERFACE: wsgi (gthread) o asgi (workers de uvicorn). Default wsgi.
+    SERVER_BIND: dirección de escucha. Default 0.0.0.0:8000.
+    SERVER_WORKERS: procesos worker. Default 2 * CPUs + 1.
+    SERVER_THREADS: hilos por worker (solo wsgi). Default 4.
+    SERVER_TIMEOUT: segundos antes de reiniciar un worker bloqueado. Default 30.
+    SERVER_MAX_REQUESTS: peticiones antes de reciclar un worker (0 desactiva). Default 1000.
+
+Recarga sin cortar peticiones: kill -HUP <pid del master>. Los workers viejos
+terminan sus peticiones (graceful_timeout) mientras los nuevos ya atienden.
+"""
+import multiprocessing
+import os
+
+interface = os.environ.get('SERVER_INTERFACE', 'wsgi')
+
+if interface == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread'
+    threads = int(os.environ.get('SERVER_THREADS', 4))
+
+bind = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('SERVER_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('SERVER_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('SERVER_KEEPALIVE', 5))
+
+# Reciclar los workers periódicamente, con jitter para que no reinicien todos a la vez
+max_requests = int(os.environ.get('SERVER_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Cada worker importa la aplicación, así el hilo del logger (src/logger.py)
+# y las conexiones a la base de datos se crean después del fork.
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Preparar el worker (señal del logger, estados de orden) antes de atender peticiones."""
+    # Después de que el worker instaló sus propias señales
+    from src.logger import install_context_refresh_signal
+    install_context_refresh_signal()
+
+    try:
+        from src.lib.OrderStatus.infrastructure.Django.OrderStatusCache import order_status_cache
+        order_status_cache.load()
+    except Exception as error:
+        worker.log.warning('No se pudo precargar los estados de orden: %s', error)
+    finally:
+        # La carga abre una conexión en el hilo principal, que no atiende
+        # peticiones: cerrarla (o devolverla al pool) en lugar de dejarla ociosa.
+        # close_old_connections() no la cerraría, aún no cumple CONN_MAX_AGE.
+        from django.db import connections
+        connections.close_all()
@@ -67,6 +67,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -94,6 +95,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición completa
+    'src.middleware.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -123,24 +126,112 @@ TEMPLATES = [
     },
 ]
 
-# WSGI_APPLICATION = 'config.wsgi.application'
+WSGI_APPLICATION = 'config.wsgi.application'
+
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Pool de conexiones en el proceso (src/postgresql_pool). Con el pool cada
+# petición devuelve su conexión al terminar, sin él cada hilo mantiene la suya
+# abierta DB_CONN_MAX_AGE segundos.
+DB_POOL = os.environ.get('DB_POOL', 'false').lower() == 'true'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'src.postgresql_pool' if DB_POOL else 'django.db.backends.postgresql_psycopg2',
         'NAME': os.environ.get('DB_NAME', 'db_prueba'),
         'USER': os.environ.get('DB_USER', 'postgres'),
         'PASSWORD': os.environ.get('DB_PASSWORD', 'msdeRH3gl25WeJyPPow1kMqlv'),
         'HOST': os.environ.get('DB_HOST', 'db'),
         'PORT': 5432,
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'HEALTH_CHECK_AFTER': float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30)),
+        },
     }
 }
 
 
+# Caché local del proceso. Con REDIS_URL se agrega una caché compartida entre
+# procesos e instancias (requiere el paquete redis).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'buuelo_y_tinto',
+    },
+}
+
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+
+# Tabla de estados de orden en memoria (src/lib/OrderStatus/infrastructure/Django/OrderStatusCache.py)
+ORDER_STATUS_CACHE = {
+    # Alias de la caché compartida usada para avisar a los demás procesos que recarguen
+    'SHARED_CACHE': 'shared' if REDIS_URL else None,
+    # Segundos entre revisiones de la versión compartida
+    'CHECK_INTERVAL': 5,
+}
+
+# Caché versionada del catálogo de productos (src/lib/Product/infrastructure/Django/ProductCatalogCache.py)
+PRODUCT_CATALOG_CACHE = {
+    'CACHE': 'shared' if REDIS_URL else 'default',
+    # Segundos que se guarda cada página o producto serializado
+    'TIMEOUT': 60,
+    # Segundos de vida de la versión del catálogo, y con ella de los ETag. Con la
+    # caché local cada proceso tiene su propia versión y no ve los cambios hechos
+    # en otro proceso hasta que la suya expira; la compartida los ve de inmediato.
+    'VERSION_TIMEOUT': None if REDIS_URL else 60,
+}
+
+# Respuestas guardadas por Idempotency-Key (src/idempotency.py)
+IDEMPOTENCY = {
+    # Con la caché local los reintentos solo se detectan en el mismo proceso
+    'CACHE': 'shared' if REDIS_URL else 'default',
+    # Segundos que se guarda la respuesta de una llave
+    'TTL': 24 * 60 * 60,
+    # Segundos que una llave queda reservada si el proceso muere sin responder
+    'LOCK_TIMEOUT': 30,
+    # Segundos que un reintento espera a la petición en curso antes de responder 409
+    'WAIT_TIMEOUT': 10,
+}
+
+# Cambios de estado de órdenes en tiempo real (src/lib/Order/infrastructure/Django/OrderStatusHub.py)
+ORDER_STATUS_STREAM = {
+    # Canal de LISTEN/NOTIFY de PostgreSQL
+    'CHANNEL': 'order_status',
+    # Eventos pendientes por cliente antes de pedirle que se resincronice
+    'QUEUE_SIZE': 100,
+    # Segundos entre comentarios keepalive
+    'HEARTBEAT': 15,
+    # El stream es para la interfaz ASGI (SERVER_INTERFACE=asgi). Bajo WSGI cada stream
+    # ocupa un hilo del worker mientras está abierto: streams abiertos a la vez por
+    # proceso antes de responder 503; por defecto ninguno y los clientes consultan el listado.
+    'WSGI_MAX_STREAMS': int(os.environ.get('ORDER_STREAM_WSGI_MAX', 0)),
+    # Segundos entre consultas al listado que se indican en el Retry-After de los streams rechazados
+    'RETRY_AFTER': 15,
+}
+
+# Permisos compilados por usuario para validate_permission (src/permission_cache.py)
+PERMISSION_CACHE = {
+    'CACHE': 'shared' if REDIS_URL else 'default',
+    # Segundos que se guardan los permisos de un usuario. Con la caché local un
+    # cambio (o una revocación) hecho en otro proceso solo se ve al expirar, por
+    # eso es corto; con la compartida todos los procesos lo ven de inmediato.
+    'TIMEOUT': 300 if REDIS_URL else 10,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -179,6 +270,9 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# collectstatic deja aquí los archivos que sirve nginx en producción
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -190,10 +284,9 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_PAGINATION_CLASS': 'src.pagination.RestPagination',
+    # Bearer (JWT), Token o sesión según el header Authorization, ver src/authentication.py
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'src.authentication.SchemeAuthentication',
     )
 }
 
@@ -205,6 +298,31 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Claims para construir el usuario sin consultar la base de datos
+    'TOKEN_OBTAIN_SERIALIZER': 'src.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_USER_CLASS': 'src.authentication.ClaimsTokenUser',
+}
+
+# Autenticación JWT sin estado (src/authentication.py)
+JWT_AUTH = {
+    # 'stateless': usuario desde los claims; 'database': carga el usuario en cada petición
+    'MODE': os.environ.get('JWT_AUTH_MODE', 'stateless'),
+    # Registro de revocaciones; con la caché local cada proceso tiene el suyo
+    'CACHE': 'shared' if REDIS_URL else 'default',
+    # Segundos que se usa el estado (activo) de un usuario antes de consultarlo de nuevo
+    'STATE_TTL': 30,
+}
+
+# Verificación de contraseñas en el login (src/password_pool.py), por proceso
+PASSWORD_CHECK_POOL = {
+    # Contraseñas que se verifican a la vez
+    'WORKERS': int(os.environ.get('LOGIN_POOL_WORKERS', 1)),
+    # Logins en espera; con el pool y la cola llenos se responde 429
+    'QUEUE_SIZE': int(os.environ.get('LOGIN_POOL_QUEUE_SIZE', 1)),
+    # Segundos de espera por la verificación antes de responder 503
+    'TIMEOUT': 5,
+    # Valor del header Retry-After de las respuestas 429 y 503
+    'RETRY_AFTER': 1,
 }
 AUTHENTICATION_BACKENDS = [
     'src.authentication.CustomBackend'
@@ -3,6 +3,8 @@ from infrastructure.models.user import User
 from infrastructure.models.product import Product
 from infrastructure.models.order import Order, OrderDetail
 from infrastructure.models.order_status import OrderStatus
+from src.admin import IdInputFilter, KeysetModelAdmin
+from src.lib.Product.infrastructure.Django.ProductCatalogCache import product_catalog_cache
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -12,25 +14,46 @@ class ProductAdmin(admin.ModelAdmin):
     ordering = ('name',)
     
     # Acciones personalizadas del src/admin.py
+    # update() no dispara señales, la versión del catálogo se cambia a mano.
     actions = ['delete_selected', 'activate_selected', 'inactivate_selected']
     
     def delete_selected(self, request, queryset):
         queryset.update(deleted=True)
+        product_catalog_cache.bump()
     delete_selected.short_description = 'Eliminar seleccionados'
     
     def activate_selected(self, request, queryset):
         queryset.update(is_active=True)
+        product_catalog_cache.bump()
     activate_selected.short_description = 'Activar seleccionados'
     
     def inactivate_selected(self, request, queryset):
         queryset.update(is_active=False)
+        product_catalog_cache.bump()
     inactivate_selected.short_description = 'Inactivar seleccionados'
 
+class OrderFilter(IdInputFilter):
+    title = 'orden'
+    parameter_name = 'order'
+
+class ProductFilter(IdInputFilter):
+    title = 'producto'
+    parameter_name = 'product'
+
+# Order y OrderDetail crecen con cada evento: conteo estimado, navegación por
+# cursor, relaciones con JOIN y autocompletado en lugar de <select> completos.
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(KeysetModelAdmin):
     list_display = ('id', 'customer', 'status', 'total', 'created_at')
+    list_select_related = ('customer', 'status')
     list_filter = ('status', 'created_at')
     search_fields = ('customer__username', 'delivery_location')
+    autocomplete_fields = ('customer',)
+
+    def get_queryset(self, request):
+        # Order.__str__ usa el cliente (autocompletado de OrderDetailAdmin). ChangeList
+        # no aplica list_select_related a un queryset que ya tiene select_related.
+        return super().get_queryset(request).select_related(*self.list_select_related)
     
     # Acciones personalizadas
     actions = ['delete_selected', 'activate_selected', 'inactivate_selected']
@@ -92,7 +115,10 @@ class UserAdmin(admin.ModelAdmin):
     inactivate_selected.short_description = 'Inactivar seleccionados'
 
 @admin.register(OrderDetail)
-class OrderDetailAdmin(admin.ModelAdmin):
+class OrderDetailAdmin(KeysetModelAdmin):
     list_display = ('id', 'order', 'product', 'quantity', 'unit_price', 'subtotal')
-    list_filter = ('order', 'product')
-    search_fields = ('order__id', 'product__name') 
\ No newline at end of file
+    list_select_related = ('order__customer', 'product')
+    list_filter = (OrderFilter, ProductFilter)
+    search_fields = ('order__id', 'product__name')
+    autocomplete_fields = ('order', 'product')
+ 
\ No newline at end of file
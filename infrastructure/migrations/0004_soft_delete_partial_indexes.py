@@ -0,0 +1,36 @@
+# Generated by Django 4.2.20 on 2026-10-18 14:29
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no bloquea las escrituras, pero no puede ir en una transacción
+    atomic = False
+
+    dependencies = [
+        ('infrastructure', '0003_remove_order_deleted_remove_order_products_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_at', 'id'], name='orders_created_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['customer', 'created_at'], name='orders_customer_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['status', 'created_at'], name='orders_status_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orderdetail',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['order', 'id'], name='order_details_order_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_at', 'id'], name='products_created_live_idx'),
+        ),
+    ]
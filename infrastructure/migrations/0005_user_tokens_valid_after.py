@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('infrastructure', '0004_soft_delete_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='tokens_valid_after',
+            field=models.DateTimeField(blank=True, help_text='Tokens from logins up to this moment are rejected', null=True, verbose_name='Tokens valid after'),
+        ),
+    ]
@@ -41,6 +41,12 @@ class Order(BaseModel):
     
     class Meta:
         db_table = 'orders'
+        # Índices parciales: CustomManager filtra deleted_at IS NULL en todos los query
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='orders_created_live_idx', condition=models.Q(deleted_at__isnull=True)),
+            models.Index(fields=['customer', 'created_at'], name='orders_customer_live_idx', condition=models.Q(deleted_at__isnull=True)),
+            models.Index(fields=['status', 'created_at'], name='orders_status_live_idx', condition=models.Q(deleted_at__isnull=True)),
+        ]
     
     def __str__(self):
         return f"Order #{self.id} - {self.customer.get_full_name() if self.customer else 'No customer'}"
@@ -86,9 +92,12 @@ class OrderDetail(BaseModel):
     
     class Meta:
         db_table = 'order_details'
+        indexes = [
+            models.Index(fields=['order', 'id'], name='order_details_order_live_idx', condition=models.Q(deleted_at__isnull=True)),
+        ]
     
     def __str__(self):
-        order_id = self.order.id if self.order else 'No order'
+        order_id = self.order_id or 'No order'
         product_name = self.product.name if self.product else 'No product'
         return f"{order_id} - {product_name} x{self.quantity}"
     
@@ -25,6 +25,9 @@ class Product(BaseModel):
     
     class Meta:
         db_table = 'products'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='products_created_live_idx', condition=models.Q(deleted_at__isnull=True)),
+        ]
     
     def __str__(self):
         return f"{self.name} (${self.price if self.price else 'No price'})"
@@ -41,6 +41,7 @@ class User(AbstractUser):
     Custom fields:
         phone: Contact phone number
         deleted_at: Timestamp when the user was soft-deleted
+        tokens_valid_after: Tokens from logins up to this moment are rejected
     """
     
     # Override email field to make it required and unique
@@ -66,6 +67,14 @@ class User(AbstractUser):
         verbose_name="Deleted at",
         help_text="Timestamp when the user was soft-deleted"
     )
+
+    # Set when the password, flags or username change (src/authentication.py)
+    tokens_valid_after = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Tokens valid after",
+        help_text="Tokens from logins up to this moment are rejected"
+    )
     
     class Meta:
         db_table = 'users'
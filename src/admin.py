@@ -1,3 +1,13 @@
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'cursor'
+
+
 def delete_selected(modeladmin, request, queryset):
     '''
     Para evitar la eliminación nativa de los elementos en el admin, se modifica
@@ -23,4 +33,125 @@ def inactivate_selected(modeladmin, request, queryset):
     '''
     queryset.update(is_active=False)
 
-inactivate_selected.short_description = 'Inactivar seleccionados'
\ No newline at end of file
+inactivate_selected.short_description = 'Inactivar seleccionados'
+
+
+class EstimatedCountPaginator(Paginator):
+    '''
+    Paginador del admin que no ejecuta COUNT(*) sobre tablas grandes: usa
+    las filas que estima el planner de Postgres para la consulta con sus
+    filtros (EXPLAIN), y solo cuenta exacto cuando la estimación es menor
+    que exact_threshold.
+    '''
+
+    exact_threshold = 10000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is None or estimate < self.exact_threshold:
+            return super().count
+        self.estimated = True
+        return estimate
+
+    def estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+
+
+class KeysetChangeList(ChangeList):
+    '''
+    Con el orden por defecto (-pk) las páginas siguientes se piden con
+    ?cursor=<último id> y filtran pk < cursor en lugar de usar OFFSET, así
+    la página 1000 cuesta lo mismo que la primera. Al ordenar por otra
+    columna se vuelve a la paginación numerada.
+    '''
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Los links de filtros y columnas vuelven a la primera página
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = list(remove or []) + [CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.keyset = ORDER_VAR not in self.params and not self.show_all
+        self.next_page_url = self.first_page_url = None
+        if not self.keyset:
+            return
+
+        if self.cursor is not None:
+            try:
+                cursor = int(self.cursor)
+            except ValueError:
+                raise IncorrectLookupParameters
+            self.result_list = self.queryset.filter(pk__lt=cursor)[:self.list_per_page]
+            self.first_page_url = self.get_query_string(remove=[CURSOR_VAR])
+        elif self.page_num != 1 or not self.multi_page:
+            return
+
+        rows = list(self.result_list)
+        if len(rows) == self.list_per_page:
+            self.next_page_url = self.get_query_string({CURSOR_VAR: rows[-1].pk})
+
+
+class KeysetModelAdmin(admin.ModelAdmin):
+    '''
+    ModelAdmin para tablas grandes: conteo estimado, sin el conteo total
+    sin filtros y navegación por cursor (KeysetChangeList).
+    '''
+
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class IdInputFilter(admin.SimpleListFilter):
+    '''
+    Filtro por el id de una relación escrito a mano, en lugar de
+    RelatedFieldListFilter que lista toda la tabla relacionada en el panel.
+    '''
+
+    template = 'admin/id_input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # SimpleListFilter solo se muestra si hay opciones
+        return (('', ''),)
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        if not value.isdigit():
+            raise IncorrectLookupParameters
+        return queryset.filter(**{self.parameter_name: value})
+
+    def choices(self, changelist):
+        yield {
+            'value': self.value() or '',
+            'clear_url': changelist.get_query_string(remove=[self.parameter_name]),
+            'hidden': [
+                (name, value) for name, value in changelist.params.items()
+                if name not in (self.parameter_name, CURSOR_VAR, PAGE_VAR)
+            ],
+        }
@@ -0,0 +1,82 @@
+'''
+Escritura masiva de los logs de cambios de BaseModel.
+'''
+import contextvars
+import weakref
+
+from django.db import connections, router, transaction
+
+
+# Buffers pendientes por conexión y savepoint: {(alias, savepoints): weakref al
+# ChangeLogBuffer}. Como el request y el usuario actual (src/middleware.py)
+# sigue a cada hilo y corrutina.
+_pending_buffers = contextvars.ContextVar('pending_change_log_buffers', default=None)
+
+
+class ChangeLogBuffer:
+    '''
+    Acumula los logs de cambios escritos en un mismo savepoint de la
+    transacción actual de una conexión y los escribe con un bulk_create por
+    clase de log cuando la transacción confirma. Se registra un solo
+    transaction.on_commit por buffer.
+
+    Cada savepoint activo tiene su propio buffer porque Django descarta los
+    on_commit registrados dentro de un savepoint que se revierte: así los
+    logs de ese savepoint se descartan con él y los de los niveles
+    exteriores se siguen escribiendo. La única referencia fuerte al buffer
+    es la de su on_commit, así un buffer descartado se libera.
+    '''
+
+    def __init__(self, using):
+        self.using = using
+        self.entries = {}
+        self.flushed = False
+
+    def add(self, log_class, entries):
+        self.entries.setdefault(log_class, []).extend(entries)
+
+    def flush(self):
+        self.flushed = True
+        for log_class, entries in self.entries.items():
+            log_class._base_manager.db_manager(self.using).bulk_create(entries)
+        self.entries = {}
+
+
+def _get_buffer(using):
+    buffers = _pending_buffers.get()
+    if buffers is None:
+        buffers = {}
+        _pending_buffers.set(buffers)
+
+    key = (using, tuple(connections[using].savepoint_ids))
+    reference = buffers.get(key)
+    buffer = reference() if reference is not None else None
+    if buffer is None or buffer.flushed:
+        # Los savepoints terminados no se repiten: sus buffers ya escritos o descartados se quitan
+        for stale_key, stale_reference in list(buffers.items()):
+            stale_buffer = stale_reference()
+            if stale_buffer is None or stale_buffer.flushed:
+                del buffers[stale_key]
+        buffer = ChangeLogBuffer(using)
+        buffers[key] = weakref.ref(buffer)
+        transaction.on_commit(buffer.flush, using=using)
+    return buffer
+
+
+def write_change_log(log_class, entries, deferred=False, using=None):
+    '''
+    Escribe los logs de cambios de un save con un solo INSERT.
+
+    Con deferred=True y dentro de un bloque atómico los logs se acumulan en
+    un buffer de la transacción y se escriben todos juntos cuando confirma.
+    Fuera de un bloque atómico se escriben de inmediato.
+    '''
+    if not entries:
+        return
+
+    using = using or router.db_for_write(log_class)
+    if deferred and connections[using].in_atomic_block:
+        _get_buffer(using).add(log_class, entries)
+        return
+
+    log_class._base_manager.db_manager(using).bulk_create(entries)
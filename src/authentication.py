@@ -1,13 +1,30 @@
 '''
     custom_auth by Juan David González Bedoya
 '''
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied, ValidationError
 from django.contrib.auth.backends import ModelBackend
 from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authentication import (
+    BaseAuthentication, SessionAuthentication, TokenAuthentication, get_authorization_header
+)
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.settings import api_settings
 
 from infrastructure.models import User
+from src.password_pool import LoginThrottled, LoginUnavailable, password_check_pool
+from src.permission_cache import permission_cache
 
 import requests
 
@@ -40,9 +57,17 @@ class CustomBackend(ModelBackend):
         try:
             # Consultar el usuario en la aplicación solo por username
             user_exist_django = User.objects.get(username=username)
-            if not user_exist_django.check_password(password):
+            # El hash se calcula en un pool acotado, con el pool lleno se responde 429/503
+            if not password_check_pool.check(user_exist_django, password):
                 return None
 
+        except (LoginThrottled, LoginUnavailable) as error:
+            if isinstance(request, Request):
+                # /token/: DRF responde 429/503 con Retry-After
+                raise
+            # Fuera de DRF (login del admin) serían un 500. PermissionDenied detiene
+            # authenticate() y el formulario muestra el error de credenciales.
+            raise PermissionDenied(str(error.detail))
 
         except User.DoesNotExist:
             # None cuando NO existe el usuario en aplicación
@@ -82,3 +107,187 @@ def jwt_payload_handler(user):
         'email': user.email,
         'exp': api_settings.ACCESS_TOKEN_LIFETIME,
     }
+
+
+# Campos del usuario que, al cambiar, invalidan los tokens ya emitidos
+REVOKING_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser', 'username', 'deleted_at')
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    '''
+    Agrega al token los datos que necesita la autenticación sin estado. Los
+    access token obtenidos con /token/refresh/ copian los claims del refresh.
+    '''
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['email'] = user.email
+        token['name'] = user.get_full_name()
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        # Momento del login, para revocar también los access token obtenidos después con el refresh.
+        # Con microsegundos: un login en el mismo segundo que una revocación, pero después, es válido
+        token['auth_time'] = round(time.time(), 6)
+        return token
+
+
+class ClaimsTokenUser(TokenUser):
+    '''
+    Usuario construido con los claims del token, sin consultar la tabla de
+    usuarios. Los permisos salen de permission_cache.
+    '''
+
+    def __str__(self):
+        return '{} ({})'.format(self.token.get('name') or self.username, self.token.get('email', ''))
+
+    def get_all_permissions(self, obj=None):
+        if obj is not None:
+            return set()
+        return set(permission_cache.permissions(self))
+
+    def has_perm(self, perm, obj=None):
+        return obj is None and permission_cache.has_perm(self, perm)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        return self.is_superuser or any(perm.startswith(module + '.') for perm in self.get_all_permissions())
+
+
+class TokenRevocation:
+    '''
+    Estado de cada usuario para los tokens sin estado: (activo, revocado_en),
+    con revocado_en en segundos (con microsegundos) desde epoch. Se carga de
+    la base de datos como máximo cada JWT_AUTH['STATE_TTL'] segundos por
+    usuario. Al cambiar un campo de REVOKING_FIELDS se guarda el momento del
+    cambio en User.tokens_valid_after y se rechazan los tokens de logins
+    anteriores.
+
+    Con la caché local cada proceso tiene su registro: el proceso que hizo
+    el cambio lo ve de inmediato y los demás al expirar STATE_TTL, cuando
+    vuelven a leer el usuario. Con la caché compartida (REDIS_URL) todos lo
+    ven de inmediato.
+    '''
+
+    @property
+    def config(self):
+        return getattr(settings, 'JWT_AUTH', {})
+
+    @property
+    def cache(self):
+        return caches[self.config.get('CACHE', 'default')]
+
+    def key(self, user_id):
+        return 'auth:user:{}'.format(user_id)
+
+    def state(self, user_id):
+        state = self.cache.get(self.key(user_id))
+        if state is None:
+            row = User.objects.filter(pk=user_id).values_list('is_active', 'deleted_at', 'tokens_valid_after').first()
+            if row is None:
+                state = (False, 0)
+            else:
+                is_active, deleted_at, tokens_valid_after = row
+                state = (is_active and deleted_at is None, tokens_valid_after.timestamp() if tokens_valid_after else 0)
+            # add: no reemplazar una revocación guardada mientras tanto
+            self.cache.add(self.key(user_id), state, self.config.get('STATE_TTL', 30))
+        return state
+
+    def check(self, token):
+        active, revoked_at = self.state(token[api_settings.USER_ID_CLAIM])
+        if not active:
+            raise AuthenticationFailed('Usuario inactivo.', code='user_inactive')
+        # Los tokens emitidos antes de agregar auth_time usan su iat
+        if token.get('auth_time', token.get('iat', 0)) <= revoked_at:
+            raise AuthenticationFailed('Token revocado.', code='token_revoked')
+
+    def revoke(self, user_id, active, revoked_at=None):
+        # Hasta que expire el último access token que se pueda obtener con un refresh anterior
+        lifetime = api_settings.REFRESH_TOKEN_LIFETIME + api_settings.ACCESS_TOKEN_LIFETIME
+        revoked_at = time.time() if revoked_at is None else revoked_at
+        self.cache.set(self.key(user_id), (active, revoked_at), int(lifetime.total_seconds()))
+
+
+token_revocation = TokenRevocation()
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    '''JWT sin consultar el usuario: ClaimsTokenUser más la revisión de TokenRevocation.'''
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        token_revocation.check(validated_token)
+        return user
+
+
+class SchemeAuthentication(BaseAuthentication):
+    '''
+    Elige el autenticador según el esquema del header Authorization, en
+    lugar de probar JWT, sesión y token en orden. Sin header se usa la
+    sesión (admin, API navegable). Con JWT_AUTH['MODE'] = 'database' el
+    esquema Bearer usa JWTAuthentication, que carga el usuario en cada petición.
+    '''
+
+    def __init__(self):
+        if getattr(settings, 'JWT_AUTH', {}).get('MODE', 'stateless') == 'stateless':
+            bearer = StatelessJWTAuthentication()
+        else:
+            bearer = JWTAuthentication()
+        self.schemes = {b'bearer': bearer}
+        # TokenAuthentication necesita el modelo de rest_framework.authtoken
+        if 'rest_framework.authtoken' in settings.INSTALLED_APPS:
+            self.schemes[b'token'] = TokenAuthentication()
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header:
+            return SessionAuthentication().authenticate(request)
+        authenticator = self.schemes.get(header[0].lower())
+        if authenticator is None:
+            return None
+        return authenticator.authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.schemes[b'bearer'].authenticate_header(request)
+
+
+def revoke_tokens(user_id, active, revoked_at=None):
+    # Ahora y otra vez al confirmar, para rechazar también los logins hechos durante la transacción
+    token_revocation.revoke(user_id, active, revoked_at)
+    transaction.on_commit(lambda: token_revocation.revoke(user_id, active))
+
+
+@receiver(pre_save, sender=User)
+def detect_token_revocation(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._revoke_tokens = False
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(REVOKING_FIELDS):
+        # El login solo guarda last_login
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*REVOKING_FIELDS).first()
+    instance._revoke_tokens = previous is not None and any(
+        previous[field] != getattr(instance, field) for field in REVOKING_FIELDS
+    )
+    if instance._revoke_tokens:
+        # Se guarda con el mismo save, así los demás procesos lo leen en TokenRevocation.state
+        instance.tokens_valid_after = datetime.now(timezone.utc)
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_user_tokens(sender, instance, update_fields=None, **kwargs):
+    if getattr(instance, '_revoke_tokens', False):
+        instance._revoke_tokens = False
+        if update_fields is not None and 'tokens_valid_after' not in update_fields:
+            User.objects.filter(pk=instance.pk).update(tokens_valid_after=instance.tokens_valid_after)
+        revoke_tokens(
+            instance.pk, instance.is_active and instance.deleted_at is None, instance.tokens_valid_after.timestamp()
+        )
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    revoke_tokens(instance.pk, False)
@@ -0,0 +1,46 @@
+'''
+Utilidades para peticiones condicionales (ETag / If-None-Match).
+'''
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework.response import Response
+
+
+def etag_matches(request, etag):
+    '''
+    Indica si el ETag coincide con alguno de los del header If-None-Match.
+    La comparación es débil (ignora el prefijo W/), como exige el RFC 9110 para GET.
+    '''
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    value = etag[2:] if etag.startswith('W/') else etag
+    return any((candidate[2:] if candidate.startswith('W/') else candidate) == value for candidate in etags)
+
+
+def is_not_modified(request, etag, last_modified=None):
+    '''
+    Evalúa las precondiciones de un GET. If-None-Match tiene prioridad; solo
+    sin él se usa If-Modified-Since contra last_modified.
+    '''
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        return etag_matches(request, etag)
+    if last_modified is not None:
+        since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return since is not None and int(last_modified.timestamp()) <= since
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    '''Agrega ETag y Last-Modified al response.'''
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    '''Response 304 sin cuerpo con los validadores actuales.'''
+    return set_validators(Response(status=304), etag, last_modified)
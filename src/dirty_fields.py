@@ -0,0 +1,76 @@
+'''
+Seguimiento de cambios por campo para los modelos.
+'''
+from django.db.models import DEFERRED
+
+
+class DirtyFieldsMixin:
+    '''
+    Guarda los valores crudos (attname) de los campos concretos la primera vez
+    que se modifica uno de ellos, en lugar de copiar la instancia completa al
+    construirla. Las instancias que solo se leen nunca toman la muestra.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # A partir de aquí las asignaciones se consideran modificaciones.
+        self.__dict__['_dirty_tracking'] = True
+
+    @classmethod
+    def tracked_attnames(cls):
+        '''Retorna los attname de los campos concretos del modelo (cacheado por clase).'''
+        attnames = cls.__dict__.get('_dirty_attnames')
+        if attnames is None:
+            attnames = frozenset(field.attname for field in cls._meta.concrete_fields)
+            cls._dirty_attnames = attnames
+        return attnames
+
+    def __setattr__(self, name, value):
+        state = self.__dict__
+        if '_dirty_initial' not in state and '_dirty_tracking' in state and name in self.tracked_attnames():
+            self.take_dirty_snapshot()
+        super().__setattr__(name, value)
+
+    def take_dirty_snapshot(self):
+        '''Guarda los valores actuales como estado inicial. Los campos diferidos quedan como DEFERRED.'''
+        state = self.__dict__
+        state['_dirty_initial'] = {attname: state.get(attname, DEFERRED) for attname in self.tracked_attnames()}
+
+    def reset_dirty_tracking(self):
+        '''Descarta la muestra, el estado actual pasa a ser el inicial.'''
+        self.__dict__.pop('_dirty_initial', None)
+
+    def is_dirty(self):
+        return bool(self.get_dirty_fields())
+
+    def get_dirty_fields(self):
+        '''
+        Retorna un diccionario {nombre_campo: valor_inicial} con los campos
+        cuyo valor crudo cambió desde que se cargó la instancia.
+        '''
+        initial = self.__dict__.get('_dirty_initial')
+        if initial is None:
+            return {}
+
+        dirty = {}
+        for field in self._meta.concrete_fields:
+            before = initial.get(field.attname, DEFERRED)
+            current = self.__dict__.get(field.attname, DEFERRED)
+            if before is DEFERRED or current is DEFERRED:
+                continue
+            if current != before:
+                dirty[field.name] = before
+        return dirty
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        initial = self.__dict__.get('_dirty_initial')
+        if initial is None:
+            return
+        if fields is None:
+            self.reset_dirty_tracking()
+            return
+        # Solo los campos recargados vuelven a su estado inicial.
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            initial[attname] = self.__dict__.get(attname, DEFERRED)
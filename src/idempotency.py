@@ -0,0 +1,167 @@
+'''
+Soporte del header Idempotency-Key para los POST que crean registros.
+
+La primera petición con una llave la reserva en la caché (cache.add es
+atómico también en Redis), ejecuta la vista y guarda el status y el cuerpo
+de la respuesta por IDEMPOTENCY['TTL'] segundos. Los reintentos con la misma
+llave reciben esa respuesta sin ejecutar la vista. Solo se guardan las
+respuestas exitosas y los errores del cliente que se repetirían igual
+(REPLAYED_CLIENT_ERRORS); con cualquier otra, o si la vista lanza una
+excepción (por ejemplo un OperationalError de la base de datos), la llave se
+libera y el reintento se ejecuta de nuevo. Si llegan mientras la
+primera sigue en curso, esperan a que termine en lugar de ejecutarla otra vez.
+
+Con la caché local cada proceso tiene su propio registro; para que los
+reintentos que llegan a otro worker o instancia también se detecten se usa
+la caché compartida (REDIS_URL).
+'''
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+PENDING = 'pending'
+# Errores del cliente que dependen solo de la petición: un reintento igual obtendría lo mismo
+REPLAYED_CLIENT_ERRORS = (
+    status.HTTP_400_BAD_REQUEST,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_422_UNPROCESSABLE_ENTITY,
+)
+
+
+class IdempotencyStore:
+    '''
+    Registro llave -> respuesta. Cada entrada es una tupla compacta:
+    (PENDING, huella) mientras la petición está en curso y
+    (status, datos, huella) cuando terminó.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Eventos de las peticiones en curso de este proceso, para despertar
+        # a los reintentos sin esperar el siguiente sondeo de la caché
+        self._inflight = {}
+
+    @property
+    def config(self):
+        return getattr(settings, 'IDEMPOTENCY', {})
+
+    @property
+    def cache(self):
+        return caches[self.config.get('CACHE', 'default')]
+
+    def cache_key(self, request, key):
+        user_id = request.user.id if request.user.is_authenticated else None
+        digest = hashlib.sha256('{}:{}:{}'.format(user_id, request.path, key).encode()).hexdigest()
+        return 'idempotency:' + digest
+
+    def fingerprint(self, request):
+        return hashlib.sha256(request.body).hexdigest()[:16]
+
+    def claim(self, cache_key, fingerprint):
+        '''Reserva la llave. Retorna False si otra petición ya la tiene.'''
+        claimed = self.cache.add(cache_key, (PENDING, fingerprint), timeout=self.config.get('LOCK_TIMEOUT', 30))
+        if claimed:
+            with self._lock:
+                self._inflight[cache_key] = threading.Event()
+        return claimed
+
+    def finish(self, cache_key, fingerprint, response):
+        '''Guarda la respuesta (o libera la llave si no se debe repetir) y despierta a los que esperan.'''
+        if response is not None and self.is_replayable(response):
+            self.cache.set(cache_key, (response.status_code, response.data, fingerprint), timeout=self.config.get('TTL', 86400))
+        else:
+            self.cache.delete(cache_key)
+
+        with self._lock:
+            event = self._inflight.pop(cache_key, None)
+        if event is not None:
+            event.set()
+
+    def is_replayable(self, response):
+        return status.is_success(response.status_code) or response.status_code in REPLAYED_CLIENT_ERRORS
+
+    def wait(self, cache_key):
+        '''
+        Espera a que termine la petición que tiene la llave. Retorna la
+        entrada final, o None si la llave se liberó o se agotó WAIT_TIMEOUT.
+        '''
+        deadline = time.monotonic() + self.config.get('WAIT_TIMEOUT', 10)
+        delay = 0.01
+        while True:
+            entry = self.cache.get(cache_key)
+            if entry is None or entry[0] != PENDING:
+                return entry
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return entry
+
+            with self._lock:
+                event = self._inflight.get(cache_key)
+            if event is not None:
+                event.wait(remaining)
+            else:
+                # La petición original está en otro proceso
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.2)
+
+    def replay(self, request, cache_key, fingerprint, handler):
+        '''Resuelve un reintento de una llave ya reservada.'''
+        entry = self.cache.get(cache_key)
+        if entry is not None and entry[-1] == fingerprint:
+            entry = self.wait(cache_key)
+        if entry is None:
+            # La original falló y liberó la llave: este reintento la ejecuta
+            return self.respond(request, handler)
+        if entry[-1] != fingerprint:
+            return Response(
+                {'detail': 'La llave Idempotency-Key ya se usó con otra petición.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if entry[0] == PENDING:
+            response = Response(
+                {'detail': 'La petición con esta llave Idempotency-Key sigue en curso.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+            response['Retry-After'] = '1'
+            return response
+
+        response = Response(entry[1], status=entry[0])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def respond(self, request, handler):
+        '''
+        Ejecuta handler() una sola vez por llave. Sin el header la petición
+        se ejecuta normalmente.
+        '''
+        key = request.META.get(HEADER)
+        if not key:
+            return handler()
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': 'Idempotency-Key admite máximo {} caracteres.'.format(MAX_KEY_LENGTH)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = self.cache_key(request, key)
+        fingerprint = self.fingerprint(request)
+        if not self.claim(cache_key, fingerprint):
+            return self.replay(request, cache_key, fingerprint, handler)
+
+        response = None
+        try:
+            response = handler()
+            return response
+        finally:
+            self.finish(cache_key, fingerprint, response)
+
+
+idempotency_store = IdempotencyStore()
@@ -3,66 +3,87 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from app.serializer import OrderSerializer
 from infrastructure.models import Order, OrderDetail, Product
-from infrastructure.models.order_status import OrderStatus
-from django.contrib.auth import get_user_model
+from src.lib.OrderStatus.infrastructure.Django.OrderStatusCache import order_status_cache
+from django.db import InterfaceError, OperationalError, transaction
 from decimal import Decimal
 
 class OrderCreateRequest(APIView):
     def create(self, request):
         try:
-            order_status = OrderStatus.objects.get(id=1)
-            
-            # Obtener datos de la orden
-            order_data = {
-                'delivery_location': request.data.get('delivery_location'),
-                'total': Decimal('0.00'),  # Se actualizará después
-                'created_by_id': request.user.id,  # Usuario del token
-                'updated_by_id': request.user.id,  # Usuario del token
-                'status': order_status,
-                'is_active': True,
-                'customer': request.user  # Usuario del token
-            }
-            
-            # Crear la orden
-            order = Order.objects.create(**order_data)
-            
-            # Procesar los detalles de la orden
-            order_details = request.data.get('details', [])
-            total = Decimal('0.00')
-            
-            for detail in order_details:
-                product_id = detail.get('product')
-                quantity = detail.get('quantity')
-                
-                if not product_id or not quantity:
-                    continue
-                
-                # Obtener el producto y su precio
-                product = Product.objects.get(id=product_id)
-                    
-                # Crear el detalle de la orden
-                order_detail = OrderDetail.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    unit_price=product.price,  # Precio del producto
+            # Normalizar las líneas del pedido antes de tocar la base de datos
+            lines = self.parse_details(request.data.get('details', []))
+
+            with transaction.atomic():
+                order_status = order_status_cache.get(1)
+
+                # Resolver todos los productos en una sola consulta
+                products = Product.objects.in_bulk({product_id for product_id, _ in lines})
+                missing = [product_id for product_id, _ in lines if product_id not in products]
+                if missing:
+                    raise Product.DoesNotExist(
+                        'Product matching query does not exist: {}'.format(', '.join(str(i) for i in missing))
+                    )
+
+                # Construir los detalles en memoria y calcular el total antes de insertar la orden
+                details = []
+                total = Decimal('0.00')
+                for product_id, quantity in lines:
+                    product = products[product_id]
+                    subtotal = quantity * product.price if product.price else None
+                    details.append(OrderDetail(
+                        product=product,
+                        quantity=quantity,
+                        unit_price=product.price,  # Precio del producto
+                        subtotal=subtotal,
+                        created_by_id=request.user.id,  # Usuario del token
+                        updated_by_id=request.user.id  # Usuario del token
+                    ))
+                    total += subtotal or Decimal('0.00')
+
+                # Crear la orden con su total definitivo
+                order = Order(
+                    delivery_location=request.data.get('delivery_location'),
+                    total=total,
                     created_by_id=request.user.id,  # Usuario del token
-                    updated_by_id=request.user.id  # Usuario del token
+                    updated_by_id=request.user.id,  # Usuario del token
+                    status=order_status,
+                    is_active=True,
+                    customer_id=request.user.id  # Usuario del token
                 )
-                
-                total += order_detail.subtotal
-            
-            # Actualizar el total de la orden
-            order.total = total
-            order.save()
-            
+                order.save()
+
+                # Insertar todos los detalles en un solo INSERT
+                for detail in details:
+                    detail.order = order
+                OrderDetail.objects.bulk_create(details)
+
             # Serializar la respuesta
             serializer = OrderSerializer(order)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
+
+        except (OperationalError, InterfaceError):
+            # Fallas transitorias de la base de datos (conexión caída, pool agotado):
+            # no son un error del cliente, responden 500 y el reintento se ejecuta de nuevo
+            raise
+
         except Exception as e:
             return Response(
                 {"error": "Error creating order", "details": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
+
+    def parse_details(self, order_details):
+        '''
+        Retorna una lista de tuplas (product_id, quantity) descartando las
+        líneas incompletas, igual que el flujo anterior.
+        '''
+        lines = []
+        for detail in order_details:
+            product_id = detail.get('product')
+            quantity = detail.get('quantity')
+
+            if not product_id or not quantity:
+                continue
+
+            lines.append((int(product_id), int(quantity)))
+        return lines
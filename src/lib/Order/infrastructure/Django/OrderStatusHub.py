@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from infrastructure.models.order import Order
+from src.lib.OrderStatus.infrastructure.Django.OrderStatusCache import order_status_cache
+
+
+logger = logging.getLogger('buuelo_y_tinto')
+
+
+def stream_config():
+    return getattr(settings, 'ORDER_STATUS_STREAM', {})
+
+
+class SubscriptionLimitReached(Exception):
+    """The process already has the maximum number of thread subscriptions."""
+
+
+class Subscription:
+    """Bounded event queue of one connected client.
+
+    Events are pushed from the hub thread. When the client reads slower than
+    events arrive and the queue fills up, the subscription is marked as
+    overflowed instead of blocking the hub; the stream then tells the client
+    to resync and closes.
+
+    Attributes:
+        customer_id: Only events of this customer are delivered (None = all)
+        loop: Event loop of an async consumer, None for a thread consumer
+    """
+
+    def __init__(self, customer_id=None, loop=None, maxsize=100):
+        self.customer_id = customer_id
+        self.loop = loop
+        self.overflowed = False
+        self.queue = asyncio.Queue(maxsize) if loop else queue.Queue(maxsize)
+
+    def push(self, event):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._put, event)
+        else:
+            self._put(event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except (queue.Full, asyncio.QueueFull):
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Blocks up to timeout seconds for the next event (None on timeout)."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout):
+        """Async version of get()."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class OrderStatusHub:
+    """In-process fan-out of order status events to the connected clients.
+
+    On PostgreSQL the events travel through LISTEN/NOTIFY: the save that
+    changes the status runs one pg_notify inside its transaction, and a
+    listener thread per process (started with the first subscription)
+    receives it and pushes it to every local subscriber. That way clients
+    connected to any worker or instance get the event. On other databases
+    the event is published to the local subscribers on commit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._listener = None
+
+    @property
+    def channel(self):
+        return stream_config().get('CHANNEL', 'order_status')
+
+    def subscribe(self, customer_id=None, loop=None, limit=None) -> Subscription:
+        """Registers a new subscriber.
+
+        Args:
+            customer_id: Only deliver the events of this customer (None = all)
+            loop: Event loop of an async consumer, None for a thread consumer
+            limit: Maximum number of thread subscriptions in the process
+
+        Raises:
+            SubscriptionLimitReached: A thread consumer would exceed limit
+        """
+        subscription = Subscription(customer_id, loop, stream_config().get('QUEUE_SIZE', 100))
+        with self._lock:
+            if loop is None and limit is not None:
+                if sum(1 for current in self._subscriptions if current.loop is None) >= limit:
+                    raise SubscriptionLimitReached()
+            self._subscriptions.add(subscription)
+        self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """Pushes the event to the local subscribers of its customer."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.customer_id is None or subscription.customer_id == event.get('customer'):
+                subscription.push(event)
+
+    def notify(self, event):
+        """Sends the event to every process once the current transaction commits."""
+        payload = json.dumps(event)
+        if connection.vendor == 'postgresql':
+            # NOTIFY is delivered on commit and discarded on rollback.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+        else:
+            transaction.on_commit(lambda: self.publish(json.loads(payload)))
+
+    def _ensure_listener(self):
+        if connection.vendor != 'postgresql':
+            return
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='order-status-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        params = connection.get_connection_params()
+        while True:
+            try:
+                listen_connection = psycopg2.connect(**params)
+                listen_connection.autocommit = True
+                with listen_connection.cursor() as cursor:
+                    cursor.execute('LISTEN {}'.format(self.channel))
+                while True:
+                    if select.select([listen_connection], [], [], 30) == ([], [], []):
+                        continue
+                    listen_connection.poll()
+                    while listen_connection.notifies:
+                        notify = listen_connection.notifies.pop(0)
+                        self.publish(json.loads(notify.payload))
+            except (psycopg2.Error, OSError, ValueError) as error:
+                logger.warning('Order status listener reconnecting: %s', error)
+                time.sleep(1)
+
+
+order_status_hub = OrderStatusHub()
+
+
+@receiver(post_save, sender=Order)
+def notify_order_status_change(sender, instance, created, **kwargs):
+    # post_save runs inside BaseModel.save, before the dirty snapshot is reset.
+    dirty = instance.get_dirty_fields()
+    if not created and 'status' not in dirty:
+        return
+    if instance.status_id is None:
+        return
+
+    try:
+        status_name = order_status_cache.get(instance.status_id).name
+    except Exception:
+        status_name = None
+
+    order_status_hub.notify({
+        'order': instance.id,
+        'customer': instance.customer_id,
+        'status': instance.status_id,
+        'status_name': status_name,
+        'previous_status': dirty.get('status'),
+        'updated_at': instance.updated_at.isoformat() if instance.updated_at else None,
+    })
@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+
+from src.lib.Order.infrastructure.Django.OrderStatusHub import (
+    SubscriptionLimitReached, order_status_hub, stream_config,
+)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Renderer for the text/event-stream action.
+
+    The events are written by the StreamingHttpResponse itself; the renderer
+    only lets content negotiation accept ``Accept: text/event-stream`` (sent
+    by every EventSource) and renders the error responses as JSON.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class SyncEventStream:
+    """Iterable of a WSGI stream that owns its subscription.
+
+    The subscription is taken before the response is returned, so the
+    stream can be refused with a status code. Django calls close() when the
+    response finishes, even if the client disconnected before the first
+    event, and close() releases the subscription.
+    """
+
+    def __init__(self, request, subscription):
+        self.request = request
+        self.subscription = subscription
+
+    def __iter__(self):
+        return self.request.sync_events(self.subscription)
+
+    def close(self):
+        order_status_hub.unsubscribe(self.subscription)
+
+
+class OrderStatusStreamRequest:
+    """Server-Sent Events stream of order status changes.
+
+    Regular users receive the events of their own orders; staff users receive
+    every order or, with ?customer=<id>, the orders of one customer. Each
+    event is written as ``event: order_status`` with the JSON payload built
+    by the hub. A comment line is sent every HEARTBEAT seconds so proxies
+    keep the connection open, and a ``resync`` event closes the stream when
+    the client falls QUEUE_SIZE events behind.
+
+    The stream is meant for the ASGI interface (SERVER_INTERFACE=asgi),
+    where an open stream only holds a queue in the event loop. Under WSGI
+    every open stream holds a worker thread for as long as it stays open, so
+    each process accepts at most WSGI_MAX_STREAMS streams (0 by default).
+    Beyond that it answers 503 with Retry-After and a Link to the order list,
+    which clients poll instead.
+    """
+
+    def stream(self, request):
+        customer_id = self.get_customer_id(request)
+        if isinstance(customer_id, Response):
+            return customer_id
+
+        if isinstance(request._request, ASGIRequest):
+            events = self.async_events(customer_id)
+        else:
+            config = stream_config()
+            try:
+                subscription = order_status_hub.subscribe(customer_id, limit=config.get('WSGI_MAX_STREAMS', 2))
+            except SubscriptionLimitReached:
+                return self.polling_response(request, config.get('RETRY_AFTER', 30))
+            events = SyncEventStream(self, subscription)
+
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # nginx no debe acumular la respuesta
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def polling_response(self, request, retry_after):
+        """503 for a stream this server cannot hold: poll the order list every retry_after seconds."""
+        orders_url = request.build_absolute_uri(reverse('orders-list'))
+        response = Response(
+            {
+                'detail': 'Este servidor no tiene streams disponibles, consulte el listado de órdenes cada {} segundos.'.format(retry_after),
+                'poll': orders_url,
+            },
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        response['Retry-After'] = str(retry_after)
+        response['Link'] = '<{}>; rel="alternate"'.format(orders_url)
+        return response
+
+    def get_customer_id(self, request):
+        if not request.user.is_staff:
+            return request.user.id
+
+        customer_id = request.query_params.get('customer')
+        if customer_id is None:
+            return None
+        try:
+            return int(customer_id)
+        except ValueError:
+            return Response({'detail': 'customer debe ser un id.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def sync_events(self, subscription):
+        heartbeat = stream_config().get('HEARTBEAT', 15)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(heartbeat)
+                if subscription.overflowed:
+                    yield self.format_event('resync', {})
+                    return
+                yield self.format_event('order_status', event) if event else ': keepalive\n\n'
+        finally:
+            order_status_hub.unsubscribe(subscription)
+
+    async def async_events(self, customer_id):
+        subscription = order_status_hub.subscribe(customer_id, loop=asyncio.get_running_loop())
+        heartbeat = stream_config().get('HEARTBEAT', 15)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = await subscription.aget(heartbeat)
+                if subscription.overflowed:
+                    yield self.format_event('resync', {})
+                    return
+                yield self.format_event('order_status', event) if event else ': keepalive\n\n'
+        finally:
+            order_status_hub.unsubscribe(subscription)
+
+    def format_event(self, name, data):
+        event_id = '{}-{}'.format(data['order'], data['status']) if data else ''
+        return 'id: {}\nevent: {}\ndata: {}\n\n'.format(event_id, name, json.dumps(data))
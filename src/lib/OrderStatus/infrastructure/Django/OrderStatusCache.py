@@ -0,0 +1,133 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from infrastructure.models.order_status import OrderStatus
+
+
+class OrderStatusCache:
+    """In-process lookup table of the active order statuses.
+
+    The status set is tiny and rarely changes, so it is loaded once on first
+    use and resolved by id or name with a dictionary lookup. Saving or
+    deleting an OrderStatus clears the table through signals.
+
+    When a shared cache alias is configured (ORDER_STATUS_CACHE['SHARED_CACHE'],
+    for example a Redis cache), every invalidation also bumps a version key in
+    it, and the other processes reload their table after noticing the new
+    version, checking at most every CHECK_INTERVAL seconds.
+
+    The table is published as a single (by_id, by_name) tuple that is
+    replaced, never modified, so a reader always sees both dictionaries from
+    the same load. The cached instances are shared between requests and must
+    not be modified either.
+    """
+
+    VERSION_KEY = 'order_status:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table_data = None
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def config(self):
+        return getattr(settings, 'ORDER_STATUS_CACHE', {})
+
+    @property
+    def shared_cache(self):
+        alias = self.config.get('SHARED_CACHE')
+        return caches[alias] if alias else None
+
+    def get(self, status_id) -> OrderStatus:
+        """Returns the status with the given id.
+
+        Raises:
+            OrderStatus.DoesNotExist: If there is no active status with that id
+        """
+        try:
+            return self._table()[0][int(status_id)]
+        except (KeyError, TypeError, ValueError):
+            raise OrderStatus.DoesNotExist('OrderStatus matching query does not exist.')
+
+    def get_by_name(self, name) -> OrderStatus:
+        """Returns the status with the given name.
+
+        Raises:
+            OrderStatus.DoesNotExist: If there is no active status with that name
+        """
+        try:
+            return self._table()[1][name]
+        except KeyError:
+            raise OrderStatus.DoesNotExist('OrderStatus matching query does not exist.')
+
+    def all(self):
+        return list(self._table()[0].values())
+
+    def load(self):
+        """Loads (or reloads) the table from the database.
+
+        Returns:
+            tuple: The (by_id, by_name) dictionaries that were loaded
+        """
+        with self._lock:
+            statuses = list(OrderStatus.objects.order_by('id'))
+            table = (
+                {status.id: status for status in statuses},
+                {status.name: status for status in statuses},
+            )
+            self._table_data = table
+            self._version = self._shared_version()
+            self._checked_at = time.monotonic()
+        return table
+
+    def invalidate(self, broadcast=True):
+        """Drops the table, it is reloaded on the next lookup.
+
+        Args:
+            broadcast: Also bump the shared version so other processes reload
+        """
+        with self._lock:
+            self._table_data = None
+        if broadcast and self.shared_cache is not None:
+            try:
+                self.shared_cache.incr(self.VERSION_KEY)
+            except ValueError:
+                self.shared_cache.add(self.VERSION_KEY, 1, timeout=None)
+
+    def _shared_version(self):
+        if self.shared_cache is None:
+            return None
+        return self.shared_cache.get(self.VERSION_KEY)
+
+    def _table(self):
+        if self._table_data is not None and self.shared_cache is not None:
+            now = time.monotonic()
+            if now - self._checked_at >= self.config.get('CHECK_INTERVAL', 5):
+                self._checked_at = now
+                if self._shared_version() != self._version:
+                    self.invalidate(broadcast=False)
+
+        # A single read: invalidate() or load() may replace it meanwhile
+        table = self._table_data
+        if table is None:
+            table = self.load()
+        return table
+
+
+order_status_cache = OrderStatusCache()
+
+
+@receiver(post_save, sender=OrderStatus)
+@receiver(post_delete, sender=OrderStatus)
+def invalidate_order_status_cache(sender, **kwargs):
+    # Invalidate now for this thread and again on commit, so no other thread
+    # keeps a table loaded before the change was committed.
+    order_status_cache.invalidate()
+    transaction.on_commit(order_status_cache.invalidate)
@@ -0,0 +1,118 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from infrastructure.models.product import Product
+from src.conditional import etag_matches, not_modified
+
+
+class ProductCatalogCache:
+    """Versioned cache of the serialized product catalog.
+
+    Serialized list pages and single products are stored in a Django cache
+    (PRODUCT_CATALOG_CACHE['CACHE'], local memory by default or the shared
+    cache when configured) under keys that include the catalog version. Any
+    Product save or delete bumps the version, which makes every previous
+    entry unreachable; they expire after TIMEOUT seconds.
+
+    Responses carry an ETag derived from the version, so clients that send
+    If-None-Match get a 304 without the catalog being read or serialized.
+
+    With a process-local cache each process has its own version and never
+    sees the bumps made by the others, so the version itself expires after
+    VERSION_TIMEOUT seconds. The next request starts a new version, which
+    bounds how long another process serves a stale catalog or answers 304
+    with a stale ETag. With a shared cache VERSION_TIMEOUT is None.
+    """
+
+    VERSION_KEY = 'catalog:version'
+
+    @property
+    def config(self):
+        return getattr(settings, 'PRODUCT_CATALOG_CACHE', {})
+
+    @property
+    def cache(self):
+        return caches[self.config.get('CACHE', 'default')]
+
+    def version(self) -> int:
+        """Returns the current catalog version, starting it if missing.
+
+        The initial value is time based so ETags from a cache that was
+        restarted never match the ones handed out before.
+        """
+        version = self.cache.get(self.VERSION_KEY)
+        if version is None:
+            self._start_version()
+            version = self.cache.get(self.VERSION_KEY)
+        return version
+
+    def bump(self):
+        """Moves the catalog to a new version.
+
+        incr keeps the expiry of the key, so bumps do not extend the life of
+        a process-local version.
+        """
+        try:
+            self.cache.incr(self.VERSION_KEY)
+        except ValueError:
+            self._start_version()
+
+    def _start_version(self):
+        self.cache.add(self.VERSION_KEY, time.time_ns() // 1000, timeout=self.config.get('VERSION_TIMEOUT'))
+
+    def list_response(self, request, build):
+        """Returns the product list for the request from the cache.
+
+        Args:
+            request: Current request, its absolute URL is part of the key
+            build: Callable returning the uncached Response
+
+        Returns:
+            Response: 304, the cached data or the freshly built response
+        """
+        key = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+        return self._respond(request, 'list:' + key, '', build)
+
+    def detail_response(self, request, pk, build):
+        """Returns a single product from the cache, see list_response."""
+        return self._respond(request, 'product:{}'.format(pk), '-{}'.format(pk), build)
+
+    def _respond(self, request, key, etag_suffix, build):
+        version = self.version()
+        etag = 'W/"catalog-{}{}"'.format(version, etag_suffix)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        cache_key = 'catalog:{}:{}'.format(version, key)
+        data = self.cache.get(cache_key)
+        if data is None:
+            response = build()
+            if response.status_code != 200:
+                return response
+            data = response.data
+            self.cache.set(cache_key, data, self.config.get('TIMEOUT', 300))
+
+        response = Response(data)
+        response['ETag'] = etag
+        # El cliente puede guardar la respuesta pero debe revalidarla con el ETag.
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+product_catalog_cache = ProductCatalogCache()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_catalog_version(sender, **kwargs):
+    # Bump now and again on commit, so no request caches the catalog read
+    # before the change was committed under the new version.
+    product_catalog_cache.bump()
+    transaction.on_commit(product_catalog_cache.bump)
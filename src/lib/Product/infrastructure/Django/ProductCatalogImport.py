@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from infrastructure.models.product import Product
+from src.audit_log import write_change_log
+from src.lib.Product.infrastructure.Django.ProductCatalogCache import product_catalog_cache
+
+
+class ProductCatalogImport:
+    """Set-based load or repricing of the whole product catalog.
+
+    The rows of a CSV or JSONL catalog are validated in Python and loaded
+    into a temporary table with COPY. Rows are matched to live products by
+    ``id`` or, without it, by ``name``. A single UPDATE applies the rows that
+    changed and a single INSERT creates the new ones. Only the columns
+    present in the file are written, so a file with ``id,price`` only
+    reprices the catalog; an empty value keeps the current one.
+
+    Change log entries for the updated products are built the same way
+    BaseModel.save builds them and written with one bulk insert, when
+    Product has a log_class. The catalog cache version is bumped on commit,
+    since the set-based statements do not send model signals.
+    """
+
+    COLUMNS = ('id', 'name', 'description', 'price', 'image', 'available')
+    WRITABLE = ('name', 'description', 'price', 'image', 'available')
+    STAGE_TABLE = 'product_catalog_import'
+
+    def __init__(self, user):
+        self.user = user
+
+    def parse(self, content, file_format):
+        """Reads the catalog rows.
+
+        Args:
+            content: Text of the file
+            file_format: 'csv' (with header) or 'jsonl'
+
+        Returns:
+            tuple: (columns present in the file, list of row dicts)
+
+        Raises:
+            ValidationError: With every invalid line
+        """
+        if file_format == 'csv':
+            reader = csv.DictReader(io.StringIO(content))
+            raw_rows = [(index, row) for index, row in enumerate(reader, start=2)]
+        elif file_format == 'jsonl':
+            raw_rows = []
+            for index, line in enumerate(content.splitlines(), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    raw_rows.append((index, json.loads(line)))
+                except ValueError:
+                    raise ValidationError('Línea {}: JSON inválido.'.format(index))
+        else:
+            raise ValidationError('Formato inválido: {}.'.format(file_format))
+
+        columns = set()
+        rows = []
+        errors = []
+        for line, raw in raw_rows:
+            try:
+                row = self.clean_row(raw)
+            except ValueError as error:
+                errors.append('Línea {}: {}'.format(line, error))
+                continue
+            row['line'] = line
+            columns.update(key for key in row if key in self.WRITABLE)
+            rows.append(row)
+        if errors:
+            raise ValidationError(errors)
+        return tuple(column for column in self.WRITABLE if column in columns), rows
+
+    def clean_row(self, raw):
+        row = {}
+        for column in self.COLUMNS:
+            value = raw.get(column)
+            if value is None or value == '':
+                continue
+            if column == 'id':
+                try:
+                    row['id'] = int(value)
+                except (TypeError, ValueError):
+                    raise ValueError('id inválido {!r}.'.format(value))
+            elif column == 'price':
+                try:
+                    row['price'] = Decimal(str(value)).quantize(Decimal('0.01'))
+                except InvalidOperation:
+                    raise ValueError('precio inválido {!r}.'.format(value))
+                # DecimalField(max_digits=10, decimal_places=2)
+                if abs(row['price']) >= Decimal('1e8'):
+                    raise ValueError('precio fuera de rango {!r}.'.format(value))
+            elif column == 'available':
+                row['available'] = value if isinstance(value, bool) else str(value).strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+            else:
+                row[column] = str(value)
+                # CharField/URLField: un valor más largo haría fallar el COPY
+                max_length = Product._meta.get_field(column).max_length
+                if max_length and len(row[column]) > max_length:
+                    raise ValueError('{} supera los {} caracteres.'.format(column, max_length))
+        if 'id' not in row and 'name' not in row:
+            raise ValueError('se necesita id o name.')
+        return row
+
+    def run(self, content, file_format, dry_run=False):
+        """Applies the catalog and returns a summary.
+
+        Returns:
+            dict: Number of created, updated and unchanged products
+
+        Raises:
+            ValidationError: Invalid rows or ids that do not exist; nothing is written
+        """
+        columns, rows = self.parse(content, file_format)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                self.stage(cursor, rows)
+                self.match(cursor)
+                changed = self.changed_rows(cursor, columns)
+                updated = self.apply_updates(cursor, columns)
+                created = self.apply_inserts(cursor)
+                cursor.execute('DROP TABLE {}'.format(self.STAGE_TABLE))
+
+            if Product.log_class:
+                write_change_log(Product.log_class, self.change_log_entries(changed, columns))
+
+            if dry_run:
+                transaction.set_rollback(True)
+            else:
+                transaction.on_commit(product_catalog_cache.bump)
+
+        return {
+            'created': created,
+            'updated': updated,
+            'unchanged': len(rows) - created - updated,
+            'dry_run': dry_run,
+        }
+
+    def stage(self, cursor, rows):
+        cursor.execute(
+            'CREATE TEMPORARY TABLE {} ('
+            'line integer, id bigint, name text, description text, price numeric(10, 2), image text, available boolean'
+            ') ON COMMIT DROP'.format(self.STAGE_TABLE)
+        )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # Las columnas ausentes van como NULL (campo vacío sin comillas)
+            writer.writerow([row['line']] + [row.get(column, '') for column in self.COLUMNS])
+        buffer.seek(0)
+        cursor.copy_expert(
+            "COPY {} (line, {}) FROM STDIN WITH (FORMAT csv)".format(self.STAGE_TABLE, ', '.join(self.COLUMNS)),
+            buffer,
+        )
+
+    def match(self, cursor):
+        table = Product._meta.db_table
+        cursor.execute(
+            'SELECT s.line FROM {0} s LEFT JOIN {1} p ON p.id = s.id AND p.deleted_at IS NULL '
+            'WHERE s.id IS NOT NULL AND p.id IS NULL ORDER BY s.line'.format(self.STAGE_TABLE, table)
+        )
+        missing = [line for line, in cursor.fetchall()]
+        if missing:
+            raise ValidationError(['Línea {}: el producto no existe.'.format(line) for line in missing])
+
+        # Sin id, el producto vivo más antiguo con el mismo nombre
+        cursor.execute(
+            'UPDATE {0} s SET id = p.id FROM ('
+            'SELECT DISTINCT ON (name) id, name FROM {1} WHERE deleted_at IS NULL ORDER BY name, id'
+            ') p WHERE s.id IS NULL AND s.name = p.name'.format(self.STAGE_TABLE, table)
+        )
+
+        # Dos filas del archivo no pueden terminar en el mismo producto
+        cursor.execute(
+            "SELECT min(line), max(line) FROM {0} GROUP BY coalesce('#' || id, name) HAVING count(*) > 1 "
+            'ORDER BY 1'.format(self.STAGE_TABLE)
+        )
+        duplicated = cursor.fetchall()
+        if duplicated:
+            raise ValidationError([
+                'Líneas {} y {}: el mismo producto está repetido.'.format(first, last) for first, last in duplicated
+            ])
+
+    def difference(self, columns):
+        """SQL condition that is true when a staged row changes its product."""
+        return ' OR '.join(
+            '(s.{0} IS NOT NULL AND p.{0} IS DISTINCT FROM s.{0})'.format(column) for column in columns
+        ) or 'FALSE'
+
+    def changed_rows(self, cursor, columns):
+        """Returns (id, old values, new values) of the products that will change."""
+        if not columns:
+            return []
+        cursor.execute(
+            'SELECT p.id, {old}, {new} FROM {stage} s JOIN {table} p ON p.id = s.id WHERE {difference}'.format(
+                old=', '.join('p.' + column for column in columns),
+                new=', '.join('coalesce(s.{0}, p.{0})'.format(column) for column in columns),
+                stage=self.STAGE_TABLE, table=Product._meta.db_table, difference=self.difference(columns),
+            )
+        )
+        size = len(columns)
+        return [(row[0], row[1:size + 1], row[size + 1:]) for row in cursor.fetchall()]
+
+    def apply_updates(self, cursor, columns):
+        if not columns:
+            return 0
+        cursor.execute(
+            'UPDATE {table} p SET {assignments}, updated_at = now(), updated_by_id = %s '
+            'FROM {stage} s WHERE p.id = s.id AND ({difference})'.format(
+                table=Product._meta.db_table, stage=self.STAGE_TABLE, difference=self.difference(columns),
+                assignments=', '.join('{0} = coalesce(s.{0}, p.{0})'.format(column) for column in columns),
+            ),
+            [self.user.id],
+        )
+        return cursor.rowcount
+
+    def apply_inserts(self, cursor):
+        cursor.execute(
+            'INSERT INTO {table} (name, description, price, image, available, is_active, created_at, updated_at, created_by_id, updated_by_id) '
+            "SELECT s.name, coalesce(s.description, ''), s.price, s.image, coalesce(s.available, true), true, now(), now(), %s, %s "
+            'FROM {stage} s WHERE s.id IS NULL'.format(table=Product._meta.db_table, stage=self.STAGE_TABLE),
+            [self.user.id, self.user.id],
+        )
+        return cursor.rowcount
+
+    def change_log_entries(self, changed, columns):
+        entries = []
+        for pk, old, new in changed:
+            product = Product(id=pk, updated_by_id=self.user.id, **dict(zip(columns, old)))
+            product.take_dirty_snapshot()
+            for column, value in zip(columns, new):
+                setattr(product, column, value)
+            entries += product.change_log_entries()
+        return entries
@@ -1,9 +1,24 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
+import signal
+import socket
 import sys
 from datetime import datetime
 import json
 import os
 
+# Tamaño máximo de la cola de logs, si se llena los registros se descartan
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# Bytes máximos del body de la petición/respuesta que se guardan en el log
+LOG_BODY_MAX_BYTES = int(os.environ.get('LOG_BODY_MAX_BYTES', 1024))
+# Fracción de peticiones exitosas a las que se les guarda el body (las fallidas siempre)
+LOG_BODY_SAMPLE_RATE = float(os.environ.get('LOG_BODY_SAMPLE_RATE', 0.1))
+# Señal que vuelve a leer los datos del proceso (container id, hostname, versión)
+LOG_CONTEXT_REFRESH_SIGNAL = os.environ.get('LOG_CONTEXT_REFRESH_SIGNAL', 'SIGHUP')
+
 def get_docker_container_id():
     """Obtiene el ID del contenedor Docker"""
     try:
@@ -12,6 +27,81 @@ def get_docker_container_id():
     except:
         return "NO_DOCKER_ID"
 
+class ProcessContext:
+    """
+    Datos del proceso que se agregan a cada log. Se resuelven una sola vez al
+    iniciar (y en cada hijo después de un fork) en lugar de leer /etc/hostname
+    por cada registro. refresh() los vuelve a leer.
+    """
+
+    def __init__(self):
+        self.refresh()
+
+    def refresh(self):
+        self.container_id = get_docker_container_id()
+        self.hostname = socket.gethostname()
+        self.pid = os.getpid()
+        self.build_version = os.environ.get('BUILD_VERSION', 'dev')
+
+    def as_dict(self):
+        return {
+            "container_id": self.container_id,
+            "hostname": self.hostname,
+            "pid": self.pid,
+            "build_version": self.build_version,
+        }
+
+process_context = ProcessContext()
+
+# Los workers creados con fork tienen otro PID
+os.register_at_fork(after_in_child=process_context.refresh)
+
+def install_context_refresh_signal():
+    """
+    Registra la señal LOG_CONTEXT_REFRESH_SIGNAL para refrescar el contexto del
+    proceso. No se llama al importar el módulo para no reemplazar los handlers
+    del servidor; config/gunicorn.py la registra en cada worker.
+    """
+    signum = getattr(signal, LOG_CONTEXT_REFRESH_SIGNAL, None)
+    if signum is None:
+        return
+    try:
+        signal.signal(signum, lambda signum, frame: process_context.refresh())
+    except ValueError:
+        # Solo el hilo principal puede registrar señales
+        pass
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    '''
+    Encola el registro sin formatearlo, el formateo y la escritura a consola y
+    archivo los hace el hilo del QueueListener. Si la cola está llena el
+    registro se descarta en lugar de bloquear el hilo del request.
+    '''
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonMessage:
+    '''Difiere el json.dumps del mensaje hasta que el hilo escritor lo formatea.'''
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return json.dumps(self.data, ensure_ascii=False, default=str)
+
+
 # Configuración del logger
 def setup_logger():
     # Crear el logger
@@ -34,14 +124,22 @@ def setup_logger():
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(formatter)
 
-    # Agregar los handlers al logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Los handlers reales corren en un hilo aparte, el logger solo encola
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
-    # Agregar el ID del contenedor como un filtro
+    logger.addHandler(NonBlockingQueueHandler(log_queue))
+    # No propagar al handler de consola del root, que formatearía en el hilo del request
+    logger.propagate = False
+
+    # Agregar los datos del proceso como un filtro
     class ContainerFilter(logging.Filter):
         def filter(self, record):
-            record.container_id = get_docker_container_id()
+            record.container_id = process_context.container_id
+            record.hostname = process_context.hostname
+            record.build_version = process_context.build_version
             return True
 
     logger.addFilter(ContainerFilter())
@@ -50,15 +148,18 @@ def setup_logger():
 # Crear el logger global
 logger = setup_logger()
 
+def truncate_body(body):
+    """Decodifica los primeros LOG_BODY_MAX_BYTES de un body sin parsearlo"""
+    text = body[:LOG_BODY_MAX_BYTES].decode('utf-8', errors='replace')
+    if len(body) > LOG_BODY_MAX_BYTES:
+        text += f"... ({len(body)} bytes)"
+    return text
+
 def format_request_body(request):
     """Formatea el body de la petición de manera segura"""
     try:
-        if request.content_type == 'application/json':
-            return json.loads(request.body)
-        elif request.content_type == 'application/x-www-form-urlencoded':
-            return dict(request.POST)
-        elif request.content_type == 'multipart/form-data':
-            return dict(request.POST)
+        if request.content_type in ('application/json', 'application/x-www-form-urlencoded'):
+            return truncate_body(request.body)
         return "Body no procesable"
     except:
         return "Body no procesable"
@@ -66,8 +167,8 @@ def format_request_body(request):
 def format_response_body(response):
     """Formatea el body de la respuesta de manera segura"""
     try:
-        if hasattr(response, 'content'):
-            return json.loads(response.content)
+        if not getattr(response, 'streaming', False):
+            return truncate_body(response.content)
         return "Respuesta no procesable"
     except:
         return "Respuesta no procesable"
@@ -83,26 +184,34 @@ def log_db_operation(operation, status, details=None):
     status_emoji = "✅" if status == "SUCCESS" else "❌"
     logger.info(f"{status_emoji} DB Operation: {operation} - {details or ''}")
 
-def log_api_request(request, response, duration, status="SUCCESS"):
+def log_api_request(request, response, duration, status="SUCCESS", timings=None):
     """Registra peticiones API completas"""
     status_emoji = "✅" if status == "SUCCESS" else "❌"
-    request_body = format_request_body(request)
-    response_body = format_response_body(response)
-    
+    # Los bodies se guardan para una muestra de las peticiones exitosas y para todas las fallidas
+    if status != "SUCCESS" or random.random() < LOG_BODY_SAMPLE_RATE:
+        request_body = format_request_body(request)
+        response_body = format_response_body(response)
+    else:
+        request_body = None
+        response_body = None
+
     log_entry = {
         "timestamp": datetime.now().isoformat(),
-        "container_id": get_docker_container_id(),
+        **process_context.as_dict(),
         "method": request.method,
         "path": request.path,
+        # La query string va aparte para poder agrupar por ruta y reproducir la petición completa
+        "query": request.META.get('QUERY_STRING', ''),
         "user": str(request.user) if hasattr(request, 'user') else "Anonymous",
         "status_code": response.status_code,
         "duration": f"{duration:.2f}s",
+        "timings_ms": timings,
         "request_body": request_body,
         "response_body": response_body,
         "status": status
     }
     
-    logger.info(f"{status_emoji} API Request: {json.dumps(log_entry, indent=2)}")
+    logger.info("%s API Request: %s", status_emoji, JsonMessage(log_entry))
 
 def log_auth_attempt(user_id, success, details=None):
     """Registra intentos de autenticación"""
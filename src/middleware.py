@@ -1,45 +1,114 @@
-import threading
+import contextvars
+from contextlib import contextmanager
 from django.utils.deprecation import MiddlewareMixin
 from src.logger import logger, log_api_request
-import time
+from src.timing import RequestTiming
 
 
-_thread_locals = threading.local()
+# Los contextvars siguen a cada hilo y a cada corrutina, funcionan igual en WSGI y ASGI
+_current_request = contextvars.ContextVar('current_request', default=None)
+_current_user = contextvars.ContextVar('current_user', default=None)
 
 def current_request():
-    '''Retorna el request'''
-    
-    return _thread_locals
+    '''Retorna el request actual o None fuera de una petición'''
 
+    return _current_request.get()
 
-class GlobalCurrentRequestMiddleware(MiddlewareMixin):
-    '''Coloca el request en el hilo local y registra logs detallados'''
-    
-    def __init__(self, get_response=None):
-        super().__init__(get_response)
-        self.start_time = None
+
+def current_user():
+    '''
+    Retorna el usuario que ejecuta la acción: el asignado con acting_user()
+    o el usuario autenticado del request actual. None si no hay ninguno.
+    '''
+    user = _current_user.get()
+    if user is not None:
+        return user
+
+    request = _current_request.get()
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user
+
+
+@contextmanager
+def acting_user(user):
+    '''
+    Asigna el usuario que ejecuta la acción para código fuera de una petición
+    (comandos, tareas en segundo plano):
+
+        with acting_user(admin):
+            product.save()
+    '''
+    token = _current_user.set(user)
+    try:
+        yield user
+    finally:
+        _current_user.reset(token)
+
+
+class RequestTimingMiddleware(MiddlewareMixin):
+    '''
+    Mide la petición completa y registra el log de la petición. Va primero en
+    MIDDLEWARE para que el tiempo incluya todos los demás middlewares, también
+    los que corren después de la vista (sesión, CSRF).
+    '''
 
     def process_request(self, request):
-        self.start_time = time.time()
-        # Log de la petición entrante
-        logger.info(f"Request: {request.method} {request.path} - User: {request.user if hasattr(request, 'user') else 'Anonymous'}")
-        _thread_locals.current_request = request
+        # Los tiempos van en el request, la instancia del middleware es compartida por todas las peticiones
+        request.timing = RequestTiming()
 
     def process_response(self, request, response):
         # Calcular tiempo de respuesta
-        duration = time.time() - self.start_time if self.start_time else 0
+        timing = getattr(request, 'timing', None)
+        timings = None
+        duration = 0
+        if timing:
+            timing.mark('end')
+            duration = timing.elapsed()
+            timings = timing.phases()
+            response['Server-Timing'] = timing.server_timing()
         
         # Determinar el estado de la respuesta
         status = "SUCCESS" if 200 <= response.status_code < 300 else "ERROR"
         
         # Registrar la petición completa
-        log_api_request(request, response, duration, status)
+        log_api_request(request, response, duration, status, timings)
+        
+        return response
+
+
+class GlobalCurrentRequestMiddleware(MiddlewareMixin):
+    '''Coloca el request en el contexto actual, marca el inicio de la vista y registra las excepciones'''
+
+    def process_request(self, request):
+        # Log de la petición entrante
+        logger.info(f"Request: {request.method} {request.path} - User: {request.user if hasattr(request, 'user') else 'Anonymous'}")
+        _current_request.set(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = getattr(request, 'timing', None)
+        if timing:
+            timing.mark('view')
+
+    def process_template_response(self, request, response):
+        # Los Response de DRF se renderizan después de este punto
+        timing = getattr(request, 'timing', None)
+        if timing:
+            timing.mark('render')
+        return response
+
+    def process_response(self, request, response):
+        # Liberar el request, el contexto puede ser reutilizado por la siguiente petición
+        _current_request.set(None)
         
         return response
 
     def process_exception(self, request, exception):
         # Calcular tiempo hasta la excepción
-        duration = time.time() - self.start_time if self.start_time else 0
+        timing = getattr(request, 'timing', None)
+        duration = timing.elapsed() if timing else 0
+        timings = timing.phases() if timing else None
         
         # Crear una respuesta de error para logging
         from django.http import JsonResponse
@@ -49,6 +118,6 @@ class GlobalCurrentRequestMiddleware(MiddlewareMixin):
         )
         
         # Registrar la petición con error
-        log_api_request(request, error_response, duration, "ERROR")
+        log_api_request(request, error_response, duration, "ERROR", timings)
         
         return None
\ No newline at end of file
@@ -1,22 +1,23 @@
 '''
 Modelo base para la creacion de los demas modelos.
 '''
-from copy import deepcopy
-
 from django.conf import settings
 from django.db import models
-from django.forms.models import model_to_dict
 from django.utils import timezone
+from src.audit_log import write_change_log
+from src.dirty_fields import DirtyFieldsMixin
 from src.manager import CustomManager
 
-from src.middleware import current_request
+from src.middleware import current_user
 
 
-class BaseModel(models.Model):
+class BaseModel(DirtyFieldsMixin, models.Model):
     '''
     Contiene los campos base de los demas modelos.
     '''
     log_class = None
+    # Acumular los logs de cambios hasta que la transacción confirme.
+    log_deferred = False
 
     created_at = models.DateTimeField('Fecha de creación', auto_now_add=True)
     updated_at = models.DateTimeField('Fecha última de modificación', auto_now=True)
@@ -50,16 +51,6 @@ class BaseModel(models.Model):
 
     objects = CustomManager()
 
-    def __init__(self, *args, **kwargs):
-        '''
-        Sobreescribir el método constructor para dejar una muestra del elemento
-        original, y comparar después
-        '''
-        super().__init__(*args, **kwargs)
-
-        # Hacer una copia del modelo para hacer una comparación de los datos antes y ahora, al momento de dejar los logs.
-        self.__initial = deepcopy(self)
-
     def delete(self, using=None, keep_parents=False):
         '''
         Sobreescribir el método eliminar, para no eliminar físicamente de la
@@ -82,63 +73,94 @@ class BaseModel(models.Model):
         Sobreescribir el metodo save para colocar de forma automatica el usuario creador o el quien actualiza.
         '''
         self.change = []
-        request = current_request()
+        user = current_user()
         # Validar si se esta creando o editando.
+        # Sin usuario en el contexto se conservan los valores asignados en la instancia.
+        # Se asigna el id: con la autenticación sin estado el usuario del request es un TokenUser.
         adding = self._state.adding
-        if self._state.adding:
-            self.created_by = request.current_request.user
-            self.updated_by = request.current_request.user
-        else:
-            self.updated_by = request.current_request.user
+        if user is not None:
+            if self._state.adding:
+                self.created_by_id = user.pk
+                self.updated_by_id = user.pk
+            else:
+                self.updated_by_id = user.pk
 
         super().save(force_insert, force_update, using, update_fields)
 
         # Preguntar si el modelo tiene o no clase para dejar logs de cambios.
         if self.log_class and not adding:
-            current = model_to_dict(self)
-            initial = model_to_dict(self.__initial)
-
-            for field in self._meta.fields:
-                # Obtener el verbose_name del campo, esto para poder mostrar el log legible (en español)
-                try:
-                    verbose_name = field.verbose_name
-                except Exception:
-                    verbose_name = field.name
-
-                #No hacer log de los campos modified_by, created_by, modified_at, created_at
-                if field.name in ['modified_by', 'created_by', 'modified_at', 'created_at']:
-                    continue
-                if field.name not in current:
-                    continue
-
-                # Preguntar si el valor del campo cambio
-                if current[field.name] != initial[field.name]:
-                    before_text = None
-                    after_text = None
-                    before_char = None
-                    after_char = None
-                    if isinstance(field, models.TextField):
-                        if getattr(self.__initial, field.name):
-                            before_text = str(getattr(self.__initial, field.name))
-                        if getattr(self, field.name):
-                            after_text = str(getattr(self, field.name))
-                    else:
-                        if getattr(self.__initial, field.name):
-                            try:
-                                before_char = str(getattr(self.__initial, 'get_' + field.name + '_display')())
-                            except Exception:
-                                before_char = str(getattr(self.__initial, field.name))
-
-                        if getattr(self, field.name):
-                            try:
-                                after_char = str(getattr(self, 'get_' + field.name + '_display')())
-                            except Exception:
-                                after_char = str(getattr(self, field.name))
-                    
-                    # Agregar el registro con el cambio a la clase de logs.
-                    log_class = self.log_class(field=field.name, verbose_name=verbose_name, before_text=before_text, after_text=after_text, before_char=before_char, after_char=after_char, record=self)
-                    log_class.save()
-                    self.change.append({'field':field.name, 'verbose_name':verbose_name, 'before_text':before_text, 'after_text':after_text, 'before_char':before_char, 'after_char':after_char, 'record':self})
+            # Un solo INSERT con todos los cambios del save.
+            write_change_log(self.log_class, self.change_log_entries(), deferred=self.log_deferred, using=using)
+
+        # Lo guardado pasa a ser el nuevo estado inicial.
+        self.reset_dirty_tracking()
+
+    def change_log_entries(self):
+        '''
+        Retorna las instancias de log_class (sin guardar) de los campos que
+        cambiaron desde que se cargó la instancia, y las deja en self.change.
+        '''
+        self.change = []
+        dirty = self.get_dirty_fields()
+        entries = []
+
+        for field in self._meta.fields:
+            if field.name not in dirty:
+                continue
+            # Obtener el verbose_name del campo, esto para poder mostrar el log legible (en español)
+            try:
+                verbose_name = field.verbose_name
+            except Exception:
+                verbose_name = field.name
+
+            #No hacer log de los campos modified_by, created_by, modified_at, created_at
+            if field.name in ['modified_by', 'created_by', 'modified_at', 'created_at']:
+                continue
+            # Igual que model_to_dict, los campos no editables no dejan log.
+            if not field.editable:
+                continue
+
+            before = dirty[field.name]
+            after = field.value_from_object(self)
+            before_text = None
+            after_text = None
+            before_char = None
+            after_char = None
+            before_id = None
+            after_id = None
+            if isinstance(field, models.TextField):
+                if before:
+                    before_text = str(before)
+                if after:
+                    after_text = str(after)
+            else:
+                before_char = self._log_display(field, before, current=False)
+                after_char = self._log_display(field, after, current=True)
+                if field.is_relation:
+                    before_id = before
+                    after_id = after
+
+            # Agregar el registro con el cambio a la clase de logs.
+            # bulk_create no pasa por BaseLogModel.save, el usuario creador se asigna aquí.
+            entries.append(self.log_class(field=field.name, verbose_name=verbose_name, before_text=before_text, after_text=after_text, before_char=before_char, after_char=after_char, before_id=before_id, after_id=after_id, record=self, created_by_id=self.updated_by_id))
+            self.change.append({'field':field.name, 'verbose_name':verbose_name, 'before_text':before_text, 'after_text':after_text, 'before_char':before_char, 'after_char':after_char, 'record':self})
+        return entries
+
+    def _log_display(self, field, value, current):
+        '''
+        Retorna el texto legible de un valor crudo para el log de cambios.
+        current indica si el valor es el actual de la instancia o el inicial.
+        '''
+        if not value:
+            return None
+        if field.is_relation:
+            if current:
+                return str(getattr(self, field.name))
+            related = field.remote_field.model._base_manager.filter(pk=value).first()
+            return str(related) if related is not None else str(value)
+        if field.flatchoices:
+            return str(dict(field.flatchoices).get(value, value))
+        return str(value)
 
     def _get_FIELD_display(self, field):
         if field.__class__.__name__ == 'MultipleChoiceField':
@@ -185,8 +207,9 @@ class BaseLogModel(models.Model):
         
         adding = self._state.adding
         if adding:
-            request = current_request()
-            self.created_by = request.current_request.user
+            user = current_user()
+            if user is not None:
+                self.created_by_id = user.pk
 
         super().save(force_insert, force_update, using, update_fields)
 
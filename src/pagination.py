@@ -1,7 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import base64
+import binascii
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class RestPagination(pagination.PageNumberPagination):
@@ -19,3 +28,125 @@ class RestPagination(pagination.PageNumberPagination):
             'current_page': int(self.request.query_params.get('page', 1)),
             'results': data
         })
+
+
+class KeysetPagination(pagination.BasePagination):
+    '''
+    Paginación por cursor sobre (created_at, id), del más reciente al más
+    antiguo. Cada página filtra desde la última fila vista en lugar de usar
+    OFFSET, y no ejecuta COUNT(*): con ?count=approx se retorna el número
+    estimado de filas de las estadísticas de Postgres.
+
+    Se habilita en cualquier BaseViewSet con pagination_class = KeysetPagination.
+    '''
+
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.queryset = queryset
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            created_at, pk, reverse = cursor
+            if reverse:
+                # Página anterior: las filas más recientes que el cursor, en orden ascendente.
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                ).order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                ).order_by('-created_at', '-id')
+
+        # Se pide una fila extra para saber si hay más páginas en esa dirección.
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, row, reverse):
+        payload = json.dumps({'c': row.created_at.isoformat(), 'i': row.pk, 'r': int(reverse)})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            created_at = parse_datetime(payload['c'])
+            if created_at is None:
+                raise ValueError
+            return created_at, int(payload['i']), bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound('Cursor inválido.')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[0], True))
+
+    def get_approximate_count(self):
+        '''
+        Retorna el número estimado de filas de la tabla (pg_class.reltuples).
+        No aplica los filtros del queryset, es solo una referencia.
+        '''
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [self.queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # reltuples es -1 cuando la tabla no ha sido analizada.
+        if not row or row[0] < 0:
+            return None
+        return row[0]
+
+    def get_paginated_response(self, data):
+        count = None
+        if self.request.query_params.get(self.count_query_param) == 'approx':
+            count = self.get_approximate_count()
+
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'count': count,
+            'results': data
+        })
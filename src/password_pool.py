@@ -0,0 +1,100 @@
+'''
+Verificación de contraseñas en un pool acotado para CustomBackend.
+
+check_password (PBKDF2) tarda decenas de milisegundos de CPU a propósito.
+Cuando miles de personas inician sesión a la vez, los logins ocupan todos
+los hilos del worker y las demás peticiones (órdenes, catálogo) esperan
+detrás de ellos.
+
+Aquí cada proceso verifica como máximo PASSWORD_CHECK_POOL['WORKERS']
+contraseñas a la vez y admite QUEUE_SIZE más en espera. Un login que llega
+con el pool lleno se rechaza de inmediato con 429 y Retry-After, sin
+calcular el hash, y uno que no se verifica dentro de TIMEOUT segundos
+recibe 503. Así los logins nunca ocupan más de WORKERS + QUEUE_SIZE hilos
+del worker y el resto queda libre para las demás peticiones.
+
+hashlib libera el GIL mientras calcula PBKDF2, por eso basta con hilos.
+'''
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import exceptions, status
+
+
+class LoginThrottled(exceptions.Throttled):
+    default_detail = 'Hay demasiados inicios de sesión en curso, intente de nuevo en unos segundos.'
+    default_code = 'login_throttled'
+
+
+class LoginUnavailable(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'No se pudo verificar la contraseña a tiempo, intente de nuevo.'
+    default_code = 'login_unavailable'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # DRF agrega el header Retry-After con exc.wait
+        self.wait = wait
+
+
+class PasswordCheckPool:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._slots = None
+
+    @property
+    def config(self):
+        return getattr(settings, 'PASSWORD_CHECK_POOL', {})
+
+    def _pool(self):
+        # Los hilos no sobreviven a un fork: cada proceso crea su propio pool
+        with self._lock:
+            if self._pid != os.getpid():
+                workers = self.config.get('WORKERS', 1)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-check')
+                self._slots = threading.BoundedSemaphore(workers + self.config.get('QUEUE_SIZE', 1))
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def check(self, user, password):
+        '''
+        Igual que user.check_password, pero con el hash calculado en el pool.
+
+        Raises:
+            LoginThrottled: El pool y su cola están llenos
+            LoginUnavailable: La verificación no terminó dentro de TIMEOUT
+        '''
+        retry_after = self.config.get('RETRY_AFTER', 1)
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            raise LoginThrottled(wait=retry_after)
+
+        rehash = []
+        try:
+            # El setter calcula el hash nuevo en el pool; el save se hace en el hilo del request, con su conexión
+            future = executor.submit(check_password, password, user.password, lambda raw: rehash.append(make_password(raw)))
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            valid = future.result(timeout=self.config.get('TIMEOUT', 5))
+        except FutureTimeoutError:
+            raise LoginUnavailable(wait=retry_after)
+
+        if rehash:
+            # El hasher o sus iteraciones cambiaron: guardar el hash actualizado. Con
+            # update, sin señales: la contraseña es la misma y no revoca los tokens.
+            user.password = rehash[0]
+            type(user)._default_manager.filter(pk=user.pk).update(password=user.password)
+        return valid
+
+
+password_check_pool = PasswordCheckPool()
@@ -0,0 +1,130 @@
+'''
+Caché de los permisos de cada usuario para validate_permission.
+
+ModelBackend consulta los permisos del usuario y los de sus grupos (dos
+queries) la primera vez que se llama has_perm sobre una instancia, y el
+usuario se carga de nuevo en cada petición. Aquí el conjunto compilado de
+permisos ('app.codename') se consulta en una sola query por id (así sirve
+también para el TokenUser de src/authentication.py) y se guarda en la caché
+por usuario, con una llave que incluye dos versiones:
+
+- la global, que cambia al modificar un grupo, un permiso o los permisos
+  de un grupo;
+- la del usuario, que cambia al modificar sus grupos o sus permisos directos.
+
+Un cambio deja inalcanzables las entradas anteriores, que expiran después
+de PERMISSION_CACHE['TIMEOUT'] segundos. Con la caché local cada proceso
+tiene sus versiones y un cambio hecho en otro proceso se ve al expirar
+TIMEOUT, que por eso es de pocos segundos; con la compartida (REDIS_URL) se
+ve de inmediato.
+'''
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from infrastructure.models import User
+
+
+GLOBAL_VERSION_KEY = 'permissions:version'
+
+
+class PermissionCache:
+
+    @property
+    def config(self):
+        return getattr(settings, 'PERMISSION_CACHE', {})
+
+    @property
+    def cache(self):
+        return caches[self.config.get('CACHE', 'default')]
+
+    def user_version_key(self, user_id):
+        return 'permissions:version:{}'.format(user_id)
+
+    def versions(self, user_id):
+        keys = [GLOBAL_VERSION_KEY, self.user_version_key(user_id)]
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        for key in missing:
+            # Inicial por tiempo, así un reinicio de la caché no reutiliza llaves anteriores
+            self.cache.add(key, time.time_ns() // 1000, timeout=None)
+        if missing:
+            found = self.cache.get_many(keys)
+        return found.get(keys[0]), found.get(keys[1])
+
+    def permissions(self, user):
+        '''Retorna el conjunto de permisos del usuario, calculándolo solo si no está en la caché.'''
+        cache_key = 'permissions:{}:{}:{}'.format(user.pk, *self.versions(user.pk))
+        permissions = self.cache.get(cache_key)
+        if permissions is None:
+            permissions = self.load(user.pk)
+            self.cache.set(cache_key, permissions, self.config.get('TIMEOUT', 300))
+        return permissions
+
+    def load(self, user_id):
+        '''
+        Los mismos permisos que ModelBackend.get_all_permissions, consultados
+        por id para que también sirvan con el TokenUser de la autenticación sin estado.
+        '''
+        rows = Permission.objects.filter(Q(user=user_id) | Q(group__user=user_id)).values_list(
+            'content_type__app_label', 'codename'
+        ).distinct()
+        return frozenset('{}.{}'.format(app_label, codename) for app_label, codename in rows)
+
+    def has_perm(self, user, permission_name):
+        '''Mismo resultado que user.has_perm con ModelBackend.'''
+        if not user.is_active:
+            return False
+        if user.is_superuser:
+            return True
+        return permission_name in self.permissions(user)
+
+    def bump(self, user_id=None):
+        '''Cambia la versión global, o la de un usuario.'''
+        key = GLOBAL_VERSION_KEY if user_id is None else self.user_version_key(user_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, time.time_ns() // 1000, timeout=None)
+
+
+permission_cache = PermissionCache()
+
+
+def bump_permission_version(user_id=None):
+    # Ahora y otra vez al confirmar la transacción, para que ninguna petición
+    # guarde con la versión nueva los permisos leídos antes del cambio
+    permission_cache.bump(user_id)
+    transaction.on_commit(lambda: permission_cache.bump(user_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permissions(sender, **kwargs):
+    bump_permission_version()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permission_version()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, User):
+        bump_permission_version(instance.pk)
+    else:
+        # Cambio desde el grupo o el permiso (group.user_set.add(...)), puede tocar a muchos usuarios
+        bump_permission_version()
@@ -0,0 +1,53 @@
+'''
+Backend de PostgreSQL con pool de conexiones en el proceso.
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'src.postgresql_pool',
+            'CONN_MAX_AGE': 0,
+            'POOL': {'MAX_SIZE': 10, 'TIMEOUT': 10, 'MAX_IDLE': 300, 'HEALTH_CHECK_AFTER': 30},
+            ...
+        }
+    }
+
+Con CONN_MAX_AGE = 0 Django cierra la conexión al final de cada petición, y
+este backend la devuelve al pool en lugar de cerrarla. Requiere psycopg2.
+'''
+import os
+import threading
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from .pool import ConnectionPool
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Las conexiones heredadas de un fork no se deben compartir con el padre.
+os.register_at_fork(after_in_child=_pools.clear)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self):
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                options = self.settings_dict.get('POOL', {})
+                pool = _pools[self.alias] = ConnectionPool(
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 10),
+                    max_idle=options.get('MAX_IDLE', 300),
+                    health_check_after=options.get('HEALTH_CHECK_AFTER', 30),
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool().acquire(partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection)
@@ -0,0 +1,94 @@
+'''
+Pool de conexiones acotado para el backend postgresql_pool.
+'''
+import collections
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class ConnectionPool:
+    '''
+    Mantiene hasta max_size conexiones abiertas por proceso. acquire() espera
+    hasta timeout segundos por una conexión libre y reutiliza primero la
+    última devuelta (LIFO), así las conexiones poco usadas envejecen y se
+    cierran al superar max_idle segundos sin uso. Las que llevan más de
+    health_check_after segundos inactivas se validan con SELECT 1 antes de
+    entregarlas.
+    '''
+
+    def __init__(self, max_size=10, timeout=10, max_idle=300, health_check_after=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, connect):
+        '''Retorna una conexión del pool o una nueva creada con connect().'''
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError(
+                'Connection pool exhausted: no connection available after {}s'.format(self.timeout)
+            )
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    return connect()
+
+                connection, released_at = item
+                idle_for = time.monotonic() - released_at
+                if connection.closed or idle_for > self.max_idle:
+                    self._discard(connection)
+                    continue
+                if idle_for > self.health_check_after and not self._is_usable(connection):
+                    self._discard(connection)
+                    continue
+                return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        '''Devuelve la conexión al pool, descartándola si quedó en mal estado.'''
+        try:
+            if not connection.closed:
+                status = connection.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    self._discard(connection)
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            if not connection.closed:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        except psycopg2.Error:
+            self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), collections.deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _is_usable(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
@@ -0,0 +1,64 @@
+'''
+Medición de tiempos por petición.
+'''
+import time
+
+
+class RequestTiming:
+    '''
+    Marcas de tiempo (perf_counter_ns) de una petición. Se guarda en el propio
+    request, así cada petición tiene las suyas aunque el servidor atienda
+    varias a la vez con hilos o corrutinas.
+
+    Marcas de los middlewares de src/middleware.py:
+        start: entra al primer middleware (RequestTimingMiddleware)
+        view: empieza la vista (GlobalCurrentRequestMiddleware)
+        serialize: la vista empieza a serializar (BaseViewSet.serialize)
+        render: la vista retornó un response sin renderizar (DRF)
+        end: el response sale del primer middleware
+    '''
+
+    # Fases reportadas: (nombre, marca inicial, marca final, descripción ASCII para el header)
+    PHASES = (
+        ('middleware', 'start', 'view', 'Middleware'),
+        ('view', 'view', 'serialize', 'Vista'),
+        ('serialize', 'serialize', 'render', 'Serializacion'),
+        ('render', 'render', 'end', 'Render'),
+        ('total', 'start', 'end', 'Total'),
+    )
+
+    def __init__(self):
+        self.marks = {'start': time.perf_counter_ns()}
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter_ns()
+
+    def elapsed(self):
+        '''Segundos desde la marca inicial.'''
+        return (time.perf_counter_ns() - self.marks['start']) / 1e9
+
+    def phases(self):
+        '''
+        Retorna {fase: milisegundos}. Si falta la marca final se usa la
+        siguiente disponible (por ejemplo, un response que no se renderiza o
+        una vista que no pasa por BaseViewSet.serialize).
+        '''
+        marks = self.marks
+        end = marks.get('end') or time.perf_counter_ns()
+        render = marks.get('render', end)
+        serialize = marks.get('serialize', render)
+        view = marks.get('view', serialize)
+        points = {'start': marks['start'], 'view': view, 'serialize': serialize, 'render': render, 'end': end}
+
+        return {
+            name: round((points[finish] - points[begin]) / 1e6, 3)
+            for name, begin, finish, _ in self.PHASES
+        }
+
+    def server_timing(self):
+        '''Valor del header Server-Timing.'''
+        phases = self.phases()
+        return ', '.join(
+            '{};dur={};desc="{}"'.format(name, phases[name], description)
+            for name, _, _, description in self.PHASES
+        )
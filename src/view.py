@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import csv
+import hashlib
 import json
 
 from django.contrib.auth.models import Group, Permission
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 from django_filters.rest_framework import  DjangoFilterBackend
 
@@ -14,13 +17,18 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.metadata import SimpleMetadata
 from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+
+from src.conditional import is_not_modified, not_modified, set_validators
+from src.permission_cache import permission_cache
 
 
 def validate_permission(type, app_code, permission_code, request):
     if permission_code is not None:
         try:
             permission_name = '{}.{}_{}'.format(app_code, type, permission_code)
-            if not request.user.has_perm(permission_name):
+            # Los permisos compilados del usuario salen de la caché, sin queries
+            if not permission_cache.has_perm(request.user, permission_name):
                 return Response({'detail': 'Acceso inválido.'}, status=403)
         except AttributeError:
             return Response({'detail': 'Acceso inválido.'}, status=403)
@@ -29,11 +37,30 @@ def validate_permission(type, app_code, permission_code, request):
     return True
 
 
+class Echo:
+    '''Objeto tipo archivo que retorna lo escrito, para usar csv.writer en streaming.'''
+
+    def write(self, value):
+        return value
+
+
 class BaseViewSet(viewsets.ModelViewSet):
 
     app_code = 'app'
     permission_code = None
     filter_backends = (DjangoFilterBackend, OrderingFilter)
+    export_chunk_size = 500
+    export_content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+    # Responder 304 a GET condicionales (If-None-Match / If-Modified-Since) en list y retrieve
+    conditional_requests = True
+    # Relaciones que también se muestran en el listado y cuyo updated_at debe cambiar el ETag,
+    # cargadas por el queryset del listado
+    conditional_related = ()
+    # Campos mostrados de las relaciones de conditional_related que no tienen updated_at
+    conditional_related_fields = {}
 
     def initialize_request(self, request, *args, **kwargs):
         return super().initialize_request(request, *args, **kwargs)
@@ -51,9 +78,10 @@ class BaseViewSet(viewsets.ModelViewSet):
         try:
             new_info_data = json.loads(json.dumps(self.serializer_class.info_data))
         except AttributeError as error:
+            # Serializador sin info_data: solo los metadatos de DRF
             new_info_data = {}
 
-        for key, value in new_info_data['fields'].items():
+        for key, value in new_info_data.get('fields', {}).items():
             if key in metedata_serializer['fields']:
 
                 # Filtros.
@@ -75,7 +103,7 @@ class BaseViewSet(viewsets.ModelViewSet):
                     value['source']['url'] = request.build_absolute_uri(reverse(value['source']['url']))
                 metedata_serializer['fields'][key].update(value)
 
-        metedata_serializer['order'] = new_info_data['order']
+        metedata_serializer['order'] = new_info_data.get('order', list(metedata_serializer['fields']))
 
         return Response(metedata_serializer)
 
@@ -84,9 +112,159 @@ class BaseViewSet(viewsets.ModelViewSet):
         if not permission is True:
             return permission
             
+        export_format = request.GET.get('export')
+        if export_format:
+            return self.export(request, export_format)
+
         if request.GET.get('nopaginate'):
             self.pagination_class = None
-        return super().list(request)
+
+        # Se pagina una sola vez: el validador sale de las mismas filas que se serializan
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+
+        validators = None
+        if self.conditional_requests and request.method == 'GET':
+            validators = self.get_conditional_state(rows, self.get_pagination_state() if page is not None else {})
+            if is_not_modified(request, *validators):
+                return not_modified(*validators)
+
+        data = self.serialize(self.get_serializer(rows, many=True))
+        if page is not None:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(data)
+        if validators:
+            set_validators(response, *validators)
+        return response
+
+    def filter_queryset(self, queryset):
+        '''
+        Aplica los filtros y termina el orden con el pk. Sin un orden total la
+        base de datos puede repartir las filas entre las páginas de forma
+        distinta en cada consulta.
+        '''
+        queryset = super().filter_queryset(queryset)
+        pk_name = queryset.model._meta.pk.name
+        ordering = list(queryset.query.order_by or (queryset.query.default_ordering and queryset.model._meta.ordering) or ())
+        if not any(isinstance(field, str) and field.lstrip('-') in ('pk', pk_name) for field in ordering):
+            ordering.append('pk')
+        return queryset.order_by(*ordering)
+
+    def serialize(self, serializer):
+        '''
+        Retorna serializer.data marcando en el request el inicio de la fase
+        serialize (src/timing.py), separada de la consulta y del render.
+        '''
+        timing = getattr(self.request, 'timing', None)
+        if timing:
+            timing.mark('serialize')
+        return serializer.data
+
+    def get_pagination_state(self):
+        '''
+        Datos de la paginación actual que también salen en el response: el
+        total (ya calculado por el paginador, sin otro COUNT) y si hay más páginas.
+        '''
+        state = {}
+        page = getattr(self.paginator, 'page', None)
+        if hasattr(page, 'paginator'):
+            state['count'] = page.paginator.count
+        for flag in ('has_next', 'has_previous'):
+            if hasattr(self.paginator, flag):
+                state[flag] = getattr(self.paginator, flag)
+        return state
+
+    def get_related_values(self, instance, related):
+        '''
+        Valores de una relación de conditional_related (updated_at, o los
+        campos de conditional_related_fields), recorridos en las instancias ya
+        cargadas: el queryset del listado debe traerlas con select_related o
+        prefetch_related para no hacer una query por fila.
+        '''
+        fields = self.conditional_related_fields.get(related, ('updated_at',))
+        objects = [instance]
+        for name in related.split('__'):
+            current = []
+            for obj in objects:
+                value = getattr(obj, name, None)
+                if hasattr(value, 'all'):
+                    current.extend(value.all())
+                elif value is not None:
+                    current.append(value)
+            objects = current
+        return [tuple(getattr(obj, field) for field in fields) for obj in objects]
+
+    def get_conditional_state(self, rows, state, related=True):
+        '''
+        Retorna (etag, last_modified) de las filas que muestra el response,
+        sin queries: pk y updated_at de cada fila, los valores de
+        conditional_related y los datos de la paginación. Los pks y el total
+        van en el ETag, así una eliminación o un cambio de orden también lo
+        cambian. Last-Modified es el max(updated_at) de las filas.
+        '''
+        state = dict(state, rows=[(row.pk, row.updated_at) for row in rows])
+        if related:
+            state['related'] = [
+                [self.get_related_values(row, relation) for relation in self.conditional_related] for row in rows
+            ]
+        digest = hashlib.md5(repr(sorted(state.items())).encode()).hexdigest()
+        last_modified = max((row.updated_at for row in rows if row.updated_at), default=None)
+        return 'W/"{}"'.format(digest), last_modified
+
+    def export(self, request, export_format):
+        '''
+        Exporta el listado completo (con filtros) en streaming, ?export=ndjson o ?export=csv.
+        El queryset se recorre con un cursor del servidor en bloques de
+        export_chunk_size y cada bloque se serializa y se envía por separado,
+        así la memoria no depende del tamaño de la tabla.
+        '''
+        if export_format not in self.export_content_types:
+            return Response({'detail': 'Formato de exportación inválido.'}, status=400)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if export_format == 'csv':
+            rows = self.export_csv_rows(queryset)
+        else:
+            rows = self.export_ndjson_rows(queryset)
+
+        response = StreamingHttpResponse(rows, content_type=self.export_content_types[export_format])
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(self.basename or 'export', export_format)
+        return response
+
+    def export_chunks(self, queryset):
+        '''Retorna los registros serializados en bloques de export_chunk_size.'''
+        chunk = []
+        for instance in queryset.iterator(chunk_size=self.export_chunk_size):
+            chunk.append(instance)
+            if len(chunk) >= self.export_chunk_size:
+                yield self.get_serializer(chunk, many=True).data
+                chunk = []
+        if chunk:
+            yield self.get_serializer(chunk, many=True).data
+
+    def export_ndjson_rows(self, queryset):
+        encoder = JSONEncoder(ensure_ascii=False)
+        for data in self.export_chunks(queryset):
+            yield ''.join(encoder.encode(row) + '\n' for row in data)
+
+    def export_csv_rows(self, queryset):
+        writer = csv.writer(Echo())
+        encoder = JSONEncoder(ensure_ascii=False)
+        header = None
+        for data in self.export_chunks(queryset):
+            lines = []
+            for row in data:
+                if header is None:
+                    header = list(row.keys())
+                    lines.append(writer.writerow(header))
+                # Los valores anidados (listas, diccionarios) van como JSON en la celda.
+                lines.append(writer.writerow([
+                    encoder.encode(row.get(key)) if isinstance(row.get(key), (list, dict)) else row.get(key)
+                    for key in header
+                ]))
+            yield ''.join(lines)
     
     def create(self, request):
         permission = validate_permission('add', self.app_code, self.permission_code, request)
@@ -100,7 +278,17 @@ class BaseViewSet(viewsets.ModelViewSet):
         if not permission is True:
             return permission
          
-        return super().retrieve(request, pk)
+        if not self.conditional_requests or request.method != 'GET':
+            return super().retrieve(request, pk)
+
+        # La misma query que el retrieve normal; si no existe responde 404 antes de evaluar If-None-Match: *
+        instance = self.get_object()
+        validators = self.get_conditional_state([instance], {}, related=False)
+        if is_not_modified(request, *validators):
+            return not_modified(*validators)
+
+        response = Response(self.serialize(self.get_serializer(instance)))
+        return set_validators(response, *validators)
     
     def update(self, request, pk=None):
         permission = validate_permission('change', self.app_code, self.permission_code, request)
@@ -0,0 +1,14 @@
+#!/bin/sh
+# Arranque del contenedor. SERVER_MODE=development usa el servidor de desarrollo
+# de Django, cualquier otro valor usa gunicorn (config/gunicorn.py).
+set -e
+
+python manage.py migrate
+python run.py
+
+if [ "$SERVER_MODE" = "development" ]; then
+    exec python manage.py runserver 0.0.0.0:8000
+fi
+
+python manage.py collectstatic --noinput
+exec gunicorn -c config/gunicorn.py